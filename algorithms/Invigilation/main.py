@@ -5,6 +5,7 @@ from algorithms.Invigilation.Course import *
 from algorithms.Invigilation.Duty import *
 from algorithms.Invigilation.Invigilator import Invigilator, InvigilatorList
 from algorithms.Invigilation.Leave import *
+from algorithms.RoomMetadata import load_room_metadata, get_room_info
 
 
 def get_invigilator_list(faculty_file_name, scholar_file_name):
@@ -887,7 +888,19 @@ def start_invigilation_process(
 
     assign_course_faculty(master_map)
 
-    assign_big_room_4_invigilators(master_map, invigilator_list, ["F102", "F105"])
+    room_metadata = load_room_metadata()
+    big_rooms_4 = [
+        room
+        for room in master_map
+        if get_room_info(room, room_metadata).invigilators >= 4
+    ]
+    big_rooms_3 = set(big_rooms_3) | {
+        room
+        for room in master_map
+        if get_room_info(room, room_metadata).invigilators == 3
+    }
+
+    assign_big_room_4_invigilators(master_map, invigilator_list, big_rooms_4)
 
     assign_big_room_3_invigilators(master_map, invigilator_list, big_rooms_3)
 
@@ -0,0 +1,58 @@
+import csv
+from itertools import groupby
+
+
+class Invigilation_Record:
+    # One row of InvigilationDuties.csv
+    header = "invigilator_psrn"
+
+    def __init__(self, row):
+        self.invigilator_psrn = row[0]
+        self.invigilator_name = row[1]
+        self.room = row[4]
+        self.course_code = row[5]
+        self.course_name = row[6]
+        self.date = row[7]
+        self.time = row[8] + " to " + row[9]
+        self.invigilator_email = row[10]
+        self.ic_psrn = row[12]
+        self.ic_name = row[13]
+        self.ic_email = row[14]
+        self.ic_chamber = row[15]
+
+
+class Staff_Duty_Record:
+    # One row of Staff Duties.csv
+    header = "Room"
+
+    def __init__(self, row):
+        self.room = row[0]
+        self.date = row[1]
+        self.start_time = row[2]
+        self.end_time = row[3]
+        self.period = row[4]
+        self.floor = row[5]
+        self.room_captain_psrn = row[6]
+        self.room_captain_name = row[7]
+        self.room_captain_email = row[8]
+        self.room_captain_phone = row[9]
+        self.room_captain_branch = row[10]
+        self.group_captain_psrn = row[11]
+        self.group_captain_name = row[12]
+        self.group_captain_email = row[13]
+        self.group_captain_phone = row[14]
+
+
+def read_records(file_name, record_type):
+    with open(file_name, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) == 0 or row[0] == record_type.header:
+                continue
+
+            yield record_type(row)
+
+
+def group_records(records, key):
+    # Records of one parsed file, grouped by recipient. The sort is stable so
+    # rows keep their file order within a recipient.
+    return groupby(sorted(records, key=key), key)
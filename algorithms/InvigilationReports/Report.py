@@ -9,59 +9,63 @@ import datetime
 
 
 class Report:
-    college_name = strings.college_name
-    office_name = strings.office_name
-    semester = strings.semester
-    date = datetime.datetime.now().strftime("%d %B %Y")
-    signature = strings.signature
-    intro = ""
-    notes = []
+    # Section of invigilation_reports_config.xml with greeting, intro and notes
+    config_section = None
 
     def __init__(self, recipent):
+        config = strings.get_config()
+
+        self.college_name = config["college_name"]
+        self.office_name = config["office_name"]
+        self.semester = config["semester"]
+        self.date = datetime.datetime.now().strftime("%d %B %Y")
+        self.signature = config["signature"]
+        self.intro = ""
+        self.notes = []
+
         self.recipent = recipent
         self.table = None
         self.greeting = ""
 
+        if self.config_section is not None:
+            self.intro = config[f"{self.config_section}_intro"]
+            self.notes = config[f"{self.config_section}_notes"]
+            self.greeting = (
+                f"{config[f'{self.config_section}_greeting']} {recipent.name}"
+            )
+
 
 class Invigilator_Report(Report):
 
-    intro = strings.invigilator_intro
-    notes = strings.invigilator_notes
+    config_section = "invigilator"
 
     def __init__(self, recipent):
         super().__init__(recipent)
         self.table = Invigilator_Report_Table()
-        self.greeting = f"{strings.invigilator_greeting} {recipent.name}"
 
 
 class IC_Report(Report):
 
-    intro = strings.ic_intro
-    notes = strings.ic_notes
+    config_section = "ic"
 
     def __init__(self, recipent):
         super().__init__(recipent)
         self.table = IC_Report_Table()
-        self.greeting = f"{strings.ic_greeting} {recipent.name}"
 
 
 class Room_Captain_Report(Report):
 
-    intro = strings.room_captain_intro
-    notes = strings.room_captain_notes
+    config_section = "room_captain"
 
     def __init__(self, recipent):
         super().__init__(recipent)
         self.table = Room_Captain_Report_Table()
-        self.greeting = f"{strings.room_captain_greeting} {recipent.name}"
 
 
 class Group_Captain_Report(Report):
 
-    intro = strings.group_captain_intro
-    notes = strings.group_captain_notes
+    config_section = "group_captain"
 
     def __init__(self, recipent):
         super().__init__(recipent)
         self.table = Group_Captain_Report_Table()
-        self.greeting = f"{strings.group_captain_greeting} {recipent.name}"
@@ -0,0 +1,196 @@
+from algorithms.InvigilationReports import styles
+
+from functools import lru_cache
+from xml.sax.saxutils import unescape
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.utils import simpleSplit
+from reportlab.lib.pagesizes import landscape, A4
+from reportlab.lib.colors import black
+
+# Same page geometry as a default SimpleDocTemplate frame, so letters drawn
+# here line up with the ones platypus builds
+PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)
+MARGIN = 72
+FRAME_PADDING = 6
+LEFT = MARGIN + FRAME_PADDING
+TOP = PAGE_HEIGHT - MARGIN - FRAME_PADDING
+BOTTOM = MARGIN + FRAME_PADDING
+WIDTH = PAGE_WIDTH - 2 * LEFT
+
+# Platypus Table defaults
+CELL_FONT = "Helvetica"
+HEADER_FONT = "Helvetica-Bold"
+CELL_FONT_SIZE = 10
+CELL_LEADING = 12
+CELL_PADDING_X = 6
+CELL_PADDING_Y = 3
+GRID_WIDTH = 0.25
+
+
+# Only the greeting changes between letters, the header, intro and notes are
+# wrapped once per process
+@lru_cache(maxsize=None)
+def get_lines(text, font_name, font_size):
+    text = unescape(" ".join(text.split()))
+    return simpleSplit(text, font_name, font_size, WIDTH)
+
+
+class Letter_Layout:
+    # Positions of everything on the page, worked out before any drawing so
+    # a letter that does not fit can be handed to platypus instead
+    def __init__(self):
+        self.lines = []
+        self.table = None
+        self.y = TOP
+        self.previous_space = 0
+        self.at_top = True
+
+    def add_paragraph(self, text, style):
+        if "<" in text:
+            # Markup needs the platypus Paragraph parser
+            raise ValueError("Paragraph markup")
+
+        if not self.at_top:
+            self.y -= max(style.spaceBefore - self.previous_space, 0)
+
+        lines = get_lines(text, style.fontName, style.fontSize)
+
+        baseline = self.y - style.fontSize
+        for line in lines:
+            self.lines.append((line, style, baseline))
+            baseline -= style.leading
+
+        self.y -= style.leading * len(lines) + style.spaceAfter
+        self.previous_space = style.spaceAfter
+        self.at_top = False
+
+    def add_space(self, height):
+        self.y -= height
+        self.previous_space = 0
+        self.at_top = False
+
+    def add_table(self, rows):
+        columns = len(rows[0])
+        widths = [0] * columns
+
+        for index, row in enumerate(rows):
+            font = HEADER_FONT if index == 0 else CELL_FONT
+            for column, cell in enumerate(row):
+                if "\n" in str(cell):
+                    raise ValueError("Multi line cell")
+                widths[column] = max(
+                    widths[column], stringWidth(str(cell), font, CELL_FONT_SIZE)
+                )
+
+        widths = [width + 2 * CELL_PADDING_X for width in widths]
+        row_height = CELL_LEADING + 2 * CELL_PADDING_Y
+        table_width = sum(widths)
+
+        if table_width > WIDTH:
+            raise ValueError("Table too wide")
+
+        self.table = (
+            rows,
+            widths,
+            row_height,
+            LEFT + (WIDTH - table_width) / 2,
+            self.y,
+        )
+        self.y -= row_height * len(rows)
+        self.previous_space = 0
+        self.at_top = False
+
+    def fits(self):
+        return self.y >= BOTTOM
+
+
+def get_letter_layout(report):
+    layout = Letter_Layout()
+
+    layout.add_paragraph(report.college_name, styles.get_title_style())
+    layout.add_paragraph(report.office_name, styles.get_title_style())
+    layout.add_paragraph(report.semester, styles.get_semester_style())
+    layout.add_paragraph(report.date, styles.get_date_style())
+    layout.add_paragraph(report.greeting, styles.get_greeting_style())
+    layout.add_paragraph(report.intro, styles.get_intro_style())
+    layout.add_space(15)
+    layout.add_table(report.table.rows)
+    layout.add_space(20)
+    layout.add_paragraph(report.signature, styles.get_signature_style())
+    layout.add_paragraph(report.office_name, styles.get_signature_style())
+    layout.add_space(20)
+
+    for index, note in enumerate(report.notes):
+        layout.add_paragraph(f"{index + 1}. {note}", styles.get_intro_style())
+
+    return layout
+
+
+def draw_line(pdf, line, style, baseline):
+    pdf.setFont(style.fontName, style.fontSize)
+
+    if style.alignment == 1:
+        pdf.drawCentredString(LEFT + WIDTH / 2, baseline, line)
+    elif style.alignment == 2:
+        pdf.drawRightString(LEFT + WIDTH, baseline, line)
+    else:
+        pdf.drawString(LEFT, baseline, line)
+
+
+def draw_table(pdf, rows, widths, row_height, x, top):
+    height = row_height * len(rows)
+
+    # One text object for the whole table, drawString starts a new one per call
+    text = pdf.beginText()
+
+    for index, row in enumerate(rows):
+        text.setFont(HEADER_FONT if index == 0 else CELL_FONT, CELL_FONT_SIZE)
+        baseline = top - (index + 1) * row_height + CELL_PADDING_Y
+        baseline += CELL_LEADING - CELL_FONT_SIZE
+
+        cell_x = x
+        for column, cell in enumerate(row):
+            text.setTextOrigin(cell_x + CELL_PADDING_X, baseline)
+            text.textOut(str(cell))
+            cell_x += widths[column]
+
+    pdf.drawText(text)
+
+    pdf.setStrokeColor(black)
+    pdf.setLineWidth(GRID_WIDTH)
+    pdf.rect(x, top - height, sum(widths), height)
+
+    for index in range(1, len(rows)):
+        y = top - index * row_height
+        pdf.line(x, y, x + sum(widths), y)
+
+    cell_x = x
+    for width in widths[:-1]:
+        cell_x += width
+        pdf.line(cell_x, top, cell_x, top - height)
+
+
+def render_report_pdf(report, file_name):
+    # Returns False when the letter needs platypus (markup, wide or long
+    # tables), in which case nothing is written
+    try:
+        layout = get_letter_layout(report)
+    except ValueError:
+        return False
+
+    if not layout.fits():
+        return False
+
+    pdf = canvas.Canvas(file_name, pagesize=landscape(A4))
+    pdf.setFillColor(black)
+
+    for line, style, baseline in layout.lines:
+        draw_line(pdf, line, style, baseline)
+
+    draw_table(pdf, *layout.table)
+
+    pdf.showPage()
+    pdf.save()
+
+    return True
@@ -5,86 +5,85 @@ from algorithms.InvigilationReports.Report import (
     Group_Captain_Report,
 )
 from algorithms.InvigilationReports.Recipent import Recipent
+from algorithms.InvigilationReports.Record import (
+    Invigilation_Record,
+    Staff_Duty_Record,
+    read_records,
+    group_records,
+)
+from algorithms.InvigilationReports.canvas_renderer import render_report_pdf
 from algorithms.InvigilationReports import styles
 
 import os
+import json
+import hashlib
 import shutil
-from reportlab.platypus import Paragraph, Table, Spacer, SimpleDocTemplate
+from itertools import islice
+from operator import attrgetter
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+    FIRST_COMPLETED,
+)
+from reportlab.platypus import (
+    Paragraph,
+    Table,
+    Spacer,
+    SimpleDocTemplate,
+    PageBreak,
+    Flowable,
+)
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import landscape, A4
 
+MANIFEST_PATH = os.path.join("Invigilation_Reports", "manifest.json")
+COMBINED_PDF_NAME = "All_Reports.pdf"
+COMBINED_INDEX_NAME = "All_Reports_index.json"
 
-def get_invigilator_reports(file_name):
-    report_map = {}
-    f = open(file_name)
-
-    for line in f.readlines():
-
-        splitted = line.strip().split(",")
-        invigilator_psrn = splitted[0]
-        invigilator_name = splitted[1]
-        room = splitted[4]
-        course_code = splitted[5]
-        course_name = splitted[6]
-        date = splitted[7]
-        time = splitted[8] + " to " + splitted[9]
-        email = splitted[10]
-        ic_name = splitted[13]
-        ic_email = splitted[14]
-        ic_chamber = splitted[15]
-
-        if invigilator_psrn not in report_map:
-            report_map[invigilator_psrn] = Invigilator_Report(
-                Recipent(invigilator_name, email)
-            )
 
-        report_map[invigilator_psrn].table.add_row(
-            [course_code, course_name, date, time, room, ic_name, ic_chamber, ic_email]
+def add_invigilator_record(report_map, record):
+    if record.invigilator_psrn not in report_map:
+        report_map[record.invigilator_psrn] = Invigilator_Report(
+            Recipent(record.invigilator_name, record.invigilator_email)
         )
 
-    f.close()
-
-    return [report for report in report_map.values()]
-
-
-def get_ic_reports(file_name):
-
-    f = open(file_name)
-
-    ic_map = {}
-
-    for line in f.readlines():
-        splitted = line.strip().split(",")
-        invigilator_name = splitted[1]
-        room = splitted[4]
-        course_code = splitted[5]
-        course_name = splitted[6]
-        date = splitted[7]
-        time = splitted[8] + " to " + splitted[9]
-        invigilator_email = splitted[10]
-        ic_psrn = splitted[12]
-        ic_name = splitted[13]
-        ic_email = splitted[14]
-
-        if ic_psrn not in ic_map:
-            ic_map[ic_psrn] = {"name": ic_name, "email": ic_email, "courses": {}}
-
-        if course_code not in ic_map[ic_psrn]["courses"]:
-            ic_map[ic_psrn]["courses"][course_code] = {
-                "name": course_name,
-                "date": date,
-                "time": time,
-                "invigilators": [],
-            }
-
-        ic_map[ic_psrn]["courses"][course_code]["invigilators"].append(
-            (room, invigilator_name, invigilator_email)
-        )
-        # ic_map[ic_psrn].table.add_row(
-        # [course_code, course_name, date, time, room, invigilator_name, invigilator_email])
-
-    f.close()
-
+    report_map[record.invigilator_psrn].table.add_row(
+        [
+            record.course_code,
+            record.course_name,
+            record.date,
+            record.time,
+            record.room,
+            record.ic_name,
+            record.ic_chamber,
+            record.ic_email,
+        ]
+    )
+
+
+def add_ic_record(ic_map, record):
+    if record.ic_psrn not in ic_map:
+        ic_map[record.ic_psrn] = {
+            "name": record.ic_name,
+            "email": record.ic_email,
+            "courses": {},
+        }
+
+    if record.course_code not in ic_map[record.ic_psrn]["courses"]:
+        ic_map[record.ic_psrn]["courses"][record.course_code] = {
+            "name": record.course_name,
+            "date": record.date,
+            "time": record.time,
+            "invigilators": [],
+        }
+
+    ic_map[record.ic_psrn]["courses"][record.course_code]["invigilators"].append(
+        (record.room, record.invigilator_name, record.invigilator_email)
+    )
+
+
+def get_ic_reports(ic_map):
     reports = []
 
     for ic in ic_map:
@@ -119,95 +118,72 @@ def get_ic_reports(file_name):
     return reports
 
 
-def get_room_captains_report(file_name):
-    report_map = {}
-    f = open(file_name)
-
-    for line in f.readlines():
-
-        splitted = line.strip().split(",")
-        room = splitted[0]
-        date = splitted[1]
-        start_time = splitted[2]
-        end_time = splitted[3]
-        period = splitted[4]
-        floor = splitted[5]
-        room_captain_psrn = splitted[6]
-        room_captain_name = splitted[7]
-        room_captain_email = splitted[8]
-        room_captain_phone = splitted[9]
-        room_captain_branch = splitted[10]
-        group_captain_psrn = splitted[11]
-        group_captain_name = splitted[12]
-        group_captain_email = splitted[13]
-        group_captain_phone = splitted[14]
-
-        if room_captain_psrn not in report_map:
-            report_map[room_captain_psrn] = Room_Captain_Report(
-                Recipent(room_captain_name, room_captain_email)
-            )
+def get_invigilator_reports(records):
+    # One report at a time, as soon as all rows of an invigilator are grouped
+    for psrn, group in group_records(records, attrgetter("invigilator_psrn")):
+        report_map = {}
+        for record in group:
+            add_invigilator_record(report_map, record)
 
-        report_map[room_captain_psrn].table.add_row(
-            [
-                room,
-                date,
-                start_time + " to " + end_time,
-                group_captain_name,
-                group_captain_email,
-                group_captain_phone,
-            ]
-        )
+        yield report_map[psrn]
 
-    f.close()
-
-    return [report for report in report_map.values()]
-
-
-def get_group_captains_report(file_name):
-    group_captain_map = {}
-    f = open(file_name)
-
-    for line in f.readlines():
-
-        splitted = line.strip().split(",")
-        room = splitted[0]
-        date = splitted[1]
-        start_time = splitted[2]
-        end_time = splitted[3]
-        period = splitted[4]
-        floor = splitted[5]
-        room_captain_psrn = splitted[6]
-        room_captain_name = splitted[7]
-        room_captain_email = splitted[8]
-        room_captain_phone = splitted[9]
-        room_captain_branch = splitted[10]
-        group_captain_psrn = splitted[11]
-        group_captain_name = splitted[12]
-        group_captain_email = splitted[13]
-        group_captain_phone = splitted[14]
-
-        if group_captain_psrn not in group_captain_map:
-            group_captain_map[group_captain_psrn] = {
-                "name": group_captain_name,
-                "email": group_captain_email,
-                "timeslots": {},
-            }
 
-        date_time = date + "|" + start_time + "|" + end_time
-        if date_time not in group_captain_map[group_captain_psrn]["timeslots"]:
-            group_captain_map[group_captain_psrn]["timeslots"][date_time] = {
-                "date": date,
-                "start_time": start_time,
-                "end_time": end_time,
-                "room_captains": [],
-            }
+def get_ic_reports_from_records(records):
+    for psrn, group in group_records(records, attrgetter("ic_psrn")):
+        ic_map = {}
+        for record in group:
+            add_ic_record(ic_map, record)
 
-        group_captain_map[group_captain_psrn]["timeslots"][date_time][
-            "room_captains"
-        ].append((room, room_captain_name, room_captain_email, room_captain_phone))
+        yield from get_ic_reports(ic_map)
 
-    f.close()
 
+def add_room_captain_record(report_map, record):
+    if record.room_captain_psrn not in report_map:
+        report_map[record.room_captain_psrn] = Room_Captain_Report(
+            Recipent(record.room_captain_name, record.room_captain_email)
+        )
+
+    report_map[record.room_captain_psrn].table.add_row(
+        [
+            record.room,
+            record.date,
+            record.start_time + " to " + record.end_time,
+            record.group_captain_name,
+            record.group_captain_email,
+            record.group_captain_phone,
+        ]
+    )
+
+
+def add_group_captain_record(group_captain_map, record):
+    if record.group_captain_psrn not in group_captain_map:
+        group_captain_map[record.group_captain_psrn] = {
+            "name": record.group_captain_name,
+            "email": record.group_captain_email,
+            "timeslots": {},
+        }
+
+    timeslots = group_captain_map[record.group_captain_psrn]["timeslots"]
+    date_time = record.date + "|" + record.start_time + "|" + record.end_time
+    if date_time not in timeslots:
+        timeslots[date_time] = {
+            "date": record.date,
+            "start_time": record.start_time,
+            "end_time": record.end_time,
+            "room_captains": [],
+        }
+
+    timeslots[date_time]["room_captains"].append(
+        (
+            record.room,
+            record.room_captain_name,
+            record.room_captain_email,
+            record.room_captain_phone,
+        )
+    )
+
+
+def get_group_captain_reports(group_captain_map):
     reports = []
 
     for group_captain in group_captain_map:
@@ -250,85 +226,319 @@ def get_group_captains_report(file_name):
     return reports
 
 
-def generate_report_pdfs(reports, path):
+def get_room_captain_reports(records):
+    for psrn, group in group_records(records, attrgetter("room_captain_psrn")):
+        report_map = {}
+        for record in group:
+            add_room_captain_record(report_map, record)
 
-    for report in reports:
-        if not (report.recipent.email):
-            print(report.recipent.name)
-        doc = SimpleDocTemplate(os.path.join(path, report.recipent.email + ".pdf"))
-        doc.pagesize = landscape(A4)
+        yield report_map[psrn]
+
+
+def get_group_captain_reports_from_records(records):
+    for psrn, group in group_records(records, attrgetter("group_captain_psrn")):
+        group_captain_map = {}
+        for record in group:
+            add_group_captain_record(group_captain_map, record)
+
+        yield from get_group_captain_reports(group_captain_map)
+
+
+class Report_Marker(Flowable):
+    # Zero sized flowable at the start of each recipient in a combined PDF.
+    # Adds a bookmark and outline entry and records the page it lands on.
+
+    def __init__(self, key, title, pages):
+        super().__init__()
+        self.key = key
+        self.title = title
+        self.pages = pages
+
+    def wrap(self, available_width, available_height):
+        return (0, 0)
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+        self.pages.append(self.canv.getPageNumber())
+
+
+def get_report_flowables(report):
+    flowables = styles.get_header_flowables(
+        report.college_name, report.office_name, report.semester, report.date
+    )
+
+    greeting = Paragraph(report.greeting, styles.get_greeting_style())
+    flowables.append(greeting)
+
+    flowables.append(styles.get_intro_flowable(report.intro))
+
+    flowables.append(Spacer(1, 15))
+
+    table = Table(report.table.rows, style=styles.get_table_style())
+    flowables.append(table)
+
+    flowables.extend(
+        styles.get_footer_flowables(
+            report.signature, report.office_name, tuple(report.notes)
+        )
+    )
+
+    return flowables
+
+
+def build_report_pdf(report, path, fast=True):
+    if not (report.recipent.email):
+        print(report.recipent.name)
+    file_name = os.path.join(path, report.recipent.email + ".pdf")
+
+    # Single page letters are drawn straight onto a canvas, platypus is
+    # only needed when the table runs over a page
+    if fast and render_report_pdf(report, file_name):
+        return file_name
+
+    doc = SimpleDocTemplate(file_name)
+    doc.pagesize = landscape(A4)
+
+    doc.build(get_report_flowables(report))
+
+    return file_name
+
+
+def build_combined_report_pdf(reports, path):
+    # Every report of a type in one document, one recipient after another,
+    # with an index of the pages each recipient occupies
+    reports = list(reports)
+    file_name = os.path.join(path, COMBINED_PDF_NAME)
+    doc = SimpleDocTemplate(file_name)
+    doc.pagesize = landscape(A4)
+
+    start_pages = []
+    flowables = []
+
+    for index, report in enumerate(reports):
+        if index > 0:
+            flowables.append(PageBreak())
+
+        flowables.append(
+            Report_Marker(
+                f"report_{index}",
+                f"{report.recipent.name} ({report.recipent.email})",
+                start_pages,
+            )
+        )
+        flowables.extend(get_report_flowables(report))
+
+    doc.build(flowables)
+
+    page_index = []
+    end_pages = [page - 1 for page in start_pages[1:]] + [doc.page]
+
+    for report, first_page, last_page in zip(reports, start_pages, end_pages):
+        page_index.append(
+            {
+                "name": report.recipent.name,
+                "email": report.recipent.email,
+                "first_page": first_page,
+                "last_page": last_page,
+            }
+        )
+
+    with open(os.path.join(path, COMBINED_INDEX_NAME), "w") as f:
+        json.dump(page_index, f, indent=2)
 
-        flowables = []
+    print(f"Generated {file_name} with {len(reports)} reports")
 
-        title = Paragraph(report.college_name, styles.get_title_style())
-        flowables.append(title)
 
-        office_name = Paragraph(report.office_name, styles.get_title_style())
-        flowables.append(office_name)
+def build_report_batch(reports, path, fast=True):
+    # File names of the PDFs written, for the manifest
+    return [build_report_pdf(report, path, fast) for report in reports]
 
-        semester = Paragraph(report.semester, styles.get_semester_style())
-        flowables.append(semester)
 
-        date = Paragraph(report.date, styles.get_date_style())
-        flowables.append(date)
+def generate_report_pdfs(
+    reports, path, workers=None, batch_size=50, combined=False, fast=True
+):
 
-        greeting = Paragraph(report.greeting, styles.get_greeting_style())
-        flowables.append(greeting)
+    # Returns the file names of the per recipient PDFs that were written
+    if combined:
+        build_combined_report_pdf(reports, path)
+        return []
 
-        intro = Paragraph(report.intro, styles.get_intro_style())
-        flowables.append(intro)
+    if workers is None or workers <= 1:
+        return [build_report_pdf(report, path, fast) for report in reports]
 
-        flowables.append(Spacer(1, 15))
+    # Reports are plain data, so batches of them are pickled to worker
+    # processes and rendered there. Only a few batches are in flight at a
+    # time so reports are read from the CSV as they are needed.
+    written = []
+    pending = set()
 
-        table = Table(report.table.rows, style=styles.get_table_style())
-        flowables.append(table)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in get_batches(reports, batch_size):
+            pending.add(executor.submit(build_report_batch, batch, path, fast))
 
-        flowables.append(Spacer(1, 20))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect_finished_batches(finished, written)
 
-        signature_1 = Paragraph(report.signature, styles.get_signature_style())
-        flowables.append(signature_1)
+        collect_finished_batches(as_completed(pending), written)
 
-        signature_2 = Paragraph(report.office_name, styles.get_signature_style())
-        flowables.append(signature_2)
+    return written
 
-        flowables.append(Spacer(1, 20))
 
-        for index, note in enumerate(report.notes):
-            item = Paragraph(f"{index + 1}. {note}", styles.get_intro_style())
-            flowables.append(item)
+def get_batches(reports, batch_size):
+    reports = iter(reports)
+    batch = list(islice(reports, batch_size))
 
-        doc.build(flowables)
+    while batch:
+        yield batch
+        batch = list(islice(reports, batch_size))
 
 
-def start_invig_report_generation(invig_csv, staff_csv):
+def collect_finished_batches(futures, written):
+    for future in futures:
+        try:
+            written.extend(future.result())
+        except Exception as e:
+            print(f"****** ERROR: Could not generate a batch of PDFs: {e} ******")
+            continue
+
+        print(f"Generated {len(written)} PDFs")
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except Exception as e:
+        print(e)
+        print("Could not read report manifest, regenerating all PDFs")
+        return {}
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def get_report_digest(report):
+    # The date is left out so unchanged letters are not rebuilt every day
+    data = json.dumps(
+        [
+            report.college_name,
+            report.office_name,
+            report.semester,
+            report.signature,
+            report.greeting,
+            report.intro,
+            report.notes,
+            report.table.rows,
+        ]
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def get_changed_reports(reports, path, old_manifest, manifest, pending):
+    # Digests of changed reports go to pending and only reach the manifest
+    # once their PDF is written. Until then the old entry is kept, so a PDF
+    # that failed to build is neither trusted nor removed as stale.
+    total = 0
+    changed = 0
+
+    for report in reports:
+        file_name = os.path.join(path, report.recipent.email + ".pdf")
+        digest = get_report_digest(report)
+        total += 1
+
+        if old_manifest.get(file_name) != digest or not os.path.exists(file_name):
+            changed += 1
+            pending[file_name] = digest
+            if file_name in old_manifest:
+                manifest[file_name] = old_manifest[file_name]
+            yield report
+        else:
+            manifest[file_name] = digest
+
+    print(f"{changed} of {total} PDFs changed")
+
+
+def remove_stale_reports(old_manifest, manifest):
+    for file_name in old_manifest:
+        if file_name not in manifest and os.path.exists(file_name):
+            print(f"Removing {file_name}")
+
+            try:
+                os.remove(file_name)
+            except OSError as e:
+                # e.g. a PDF still open in a viewer on Windows
+                print(f"****** ERROR: Could not remove {file_name}: {e} ******")
+
+
+def start_invig_report_generation(
+    invig_csv, staff_csv, workers=os.cpu_count(), combined=False
+):
 
     print("***** Starting Report Generation *****")
 
-    if os.path.exists("./Invigilation_Reports") and os.path.isdir(
-        "./Invigilation_Reports"
-    ):
+    # Without a manifest nothing on disk can be trusted, start from scratch
+    if not os.path.exists(MANIFEST_PATH) and os.path.isdir("./Invigilation_Reports"):
         shutil.rmtree("./Invigilation_Reports")
 
-    os.mkdir("./Invigilation_Reports")
-    os.mkdir("./Invigilation_Reports/IC")
-    os.mkdir("./Invigilation_Reports/Instructor")
-    os.mkdir("./Invigilation_Reports/Room_Captains")
-    os.mkdir("./Invigilation_Reports/Group_Captains")
-
-    print("******** Generating Instructor PDFs ********")
-    invigilator_reports = get_invigilator_reports(invig_csv)
-    generate_report_pdfs(invigilator_reports, "./Invigilation_Reports/Instructor")
+    os.makedirs("./Invigilation_Reports/IC", exist_ok=True)
+    os.makedirs("./Invigilation_Reports/Instructor", exist_ok=True)
+    os.makedirs("./Invigilation_Reports/Room_Captains", exist_ok=True)
+    os.makedirs("./Invigilation_Reports/Group_Captains", exist_ok=True)
+
+    old_manifest = load_manifest()
+    manifest = {}
+    pending = {}
+
+    # Each CSV is parsed once, both report types are grouped from the same
+    # records and only the reports themselves are built one at a time
+    invigilation_records = list(read_records(invig_csv, Invigilation_Record))
+    staff_records = list(read_records(staff_csv, Staff_Duty_Record))
+
+    for title, get_reports, records, path in [
+        (
+            "Instructor",
+            get_invigilator_reports,
+            invigilation_records,
+            "./Invigilation_Reports/Instructor",
+        ),
+        (
+            "IC",
+            get_ic_reports_from_records,
+            invigilation_records,
+            "./Invigilation_Reports/IC",
+        ),
+        (
+            "Room Captain",
+            get_room_captain_reports,
+            staff_records,
+            "./Invigilation_Reports/Room_Captains",
+        ),
+        (
+            "Group Captain",
+            get_group_captain_reports_from_records,
+            staff_records,
+            "./Invigilation_Reports/Group_Captains",
+        ),
+    ]:
+        print(f"******** Generating {title} PDFs ********")
+        changed_reports = get_changed_reports(
+            get_reports(records), path, old_manifest, manifest, pending
+        )
 
-    print("******** Generating IC PDFs ********")
-    ic_reports = get_ic_reports(invig_csv)
-    generate_report_pdfs(ic_reports, "./Invigilation_Reports/IC")
+        for file_name in generate_report_pdfs(changed_reports, path, workers):
+            manifest[file_name] = pending[file_name]
 
-    print("******** Generating Room Captain PDFs ********")
-    room_captain_reports = get_room_captains_report(staff_csv)
-    generate_report_pdfs(room_captain_reports, "./Invigilation_Reports/Room_Captains")
+        if combined:
+            generate_report_pdfs(get_reports(records), path, combined=True)
 
-    print("******** Generating Group Captain PDFs ********")
-    group_captain_reports = get_group_captains_report(staff_csv)
-    generate_report_pdfs(group_captain_reports, "./Invigilation_Reports/Group_Captains")
+    remove_stale_reports(old_manifest, manifest)
+    save_manifest(manifest)
 
     print("******** Done ********")
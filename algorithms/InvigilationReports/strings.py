@@ -1,26 +1,57 @@
-from bs4 import BeautifulSoup
-import os, sys
+from lxml import etree
+import os
 
-f = open("./invigilation_reports_config.xml")
-parsed = BeautifulSoup(f, "xml")
+CONFIG_PATH = "./invigilation_reports_config.xml"
+SECTIONS = ["invigilator", "ic", "room_captain", "group_captain"]
 
-college_name = parsed.college.text
-office_name = parsed.office.text
-semester = parsed.semester.text
-signature = parsed.signature.text
+# path -> (mtime, config); reparsed whenever the file changes on disk
+loaded_configs = {}
 
-invigilator_greeting = parsed.invigilator.greeting.text
-invigilator_intro = parsed.invigilator.intro.text
-invigilator_notes = [x.text for x in parsed.invigilator.notes.findAll("note")]
 
-ic_greeting = parsed.ic.greeting.text
-ic_intro = parsed.ic.intro.text
-ic_notes = [x.text for x in parsed.ic.notes.findAll("note")]
+def get_text(element):
+    if element is None:
+        return ""
+    return "".join(element.itertext())
 
-room_captain_greeting = parsed.room_captain.greeting.text
-room_captain_intro = parsed.room_captain.intro.text
-room_captain_notes = [x.text for x in parsed.room_captain.notes.findAll("note")]
 
-group_captain_greeting = parsed.group_captain.greeting.text
-group_captain_intro = parsed.group_captain.intro.text
-group_captain_notes = [x.text for x in parsed.group_captain.notes.findAll("note")]
+def parse_config(path):
+    # recover=True so hand edited files with unclosed tags still load
+    parsed = etree.parse(path, etree.XMLParser(recover=True)).getroot()
+
+    config = {
+        "college_name": get_text(parsed.find(".//college")),
+        "office_name": get_text(parsed.find(".//office")),
+        "semester": get_text(parsed.find(".//semester")),
+        "signature": get_text(parsed.find(".//signature")),
+    }
+
+    for section in SECTIONS:
+        element = parsed.find(f".//{section}")
+        notes = element.find("notes")
+
+        config[f"{section}_greeting"] = get_text(element.find("greeting"))
+        config[f"{section}_intro"] = get_text(element.find("intro"))
+        config[f"{section}_notes"] = (
+            [get_text(note) for note in notes.iter("note")] if notes is not None else []
+        )
+
+    return config
+
+
+def get_config(path=CONFIG_PATH):
+    mtime = os.path.getmtime(path)
+
+    if path not in loaded_configs or loaded_configs[path][0] != mtime:
+        loaded_configs[path] = (mtime, parse_config(path))
+
+    return loaded_configs[path][1]
+
+
+def __getattr__(name):
+    # strings.college_name etc. still work, read from the current config
+    config = get_config()
+
+    if name in config:
+        return config[name]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,14 @@
+import copy
+from functools import lru_cache
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import TableStyle
+from reportlab.platypus import TableStyle, Paragraph, Spacer
 from reportlab.lib.colors import black, Color
 
+# Styles and the flowables shared by every report of a type are built once
+# per process; only the greeting and table are built per recipient.
 
+
+@lru_cache(maxsize=None)
 def get_title_style():
     style_sheet = getSampleStyleSheet()
     title_style = style_sheet["Title"]
@@ -10,6 +16,7 @@ def get_title_style():
     return title_style
 
 
+@lru_cache(maxsize=None)
 def get_semester_style():
     style_sheet = getSampleStyleSheet()
     semester_style = style_sheet["Title"]
@@ -17,6 +24,7 @@ def get_semester_style():
     return semester_style
 
 
+@lru_cache(maxsize=None)
 def get_date_style():
     style_sheet = getSampleStyleSheet()
     date_style = style_sheet["BodyText"]
@@ -25,6 +33,7 @@ def get_date_style():
     return date_style
 
 
+@lru_cache(maxsize=None)
 def get_greeting_style():
     style_sheet = getSampleStyleSheet()
     greeting_style = style_sheet["Heading3"]
@@ -33,12 +42,14 @@ def get_greeting_style():
     return greeting_style
 
 
+@lru_cache(maxsize=None)
 def get_intro_style():
     style_sheet = getSampleStyleSheet()
     intro_style = style_sheet["BodyText"]
     return intro_style
 
 
+@lru_cache(maxsize=None)
 def get_table_style():
     return TableStyle([
         ('BOX', (0,0), (-1,-1), 0.25, black),
@@ -46,6 +57,7 @@ def get_table_style():
         ('FONTNAME', (0, 0), (-1, 0), "Helvetica-Bold"),
     ])
 
+@lru_cache(maxsize=None)
 def get_signature_style():
     style_sheet = getSampleStyleSheet()
     signature_style = style_sheet["Title"]
@@ -53,3 +65,53 @@ def get_signature_style():
     signature_style.alignment = 2
     signature_style.leading = 10
     return signature_style
+
+
+# Platypus keeps layout state on flowables, so every document gets shallow
+# copies of the cached ones; the parsed text is shared between copies.
+def copy_flowables(flowables):
+    return [copy.copy(flowable) for flowable in flowables]
+
+
+@lru_cache(maxsize=None)
+def build_header_flowables(college_name, office_name, semester, date):
+    return (
+        Paragraph(college_name, get_title_style()),
+        Paragraph(office_name, get_title_style()),
+        Paragraph(semester, get_semester_style()),
+        Paragraph(date, get_date_style()),
+    )
+
+
+@lru_cache(maxsize=None)
+def build_intro_flowable(intro):
+    return Paragraph(intro, get_intro_style())
+
+
+@lru_cache(maxsize=None)
+def build_footer_flowables(signature, office_name, notes):
+    flowables = [
+        Spacer(1, 20),
+        Paragraph(signature, get_signature_style()),
+        Paragraph(office_name, get_signature_style()),
+        Spacer(1, 20),
+    ]
+
+    for index, note in enumerate(notes):
+        flowables.append(Paragraph(f"{index + 1}. {note}", get_intro_style()))
+
+    return tuple(flowables)
+
+
+def get_header_flowables(college_name, office_name, semester, date):
+    return copy_flowables(
+        build_header_flowables(college_name, office_name, semester, date)
+    )
+
+
+def get_intro_flowable(intro):
+    return copy.copy(build_intro_flowable(intro))
+
+
+def get_footer_flowables(signature, office_name, notes):
+    return copy_flowables(build_footer_flowables(signature, office_name, notes))
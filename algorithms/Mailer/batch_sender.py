@@ -0,0 +1,109 @@
+from algorithms.Mailer.rate_limiter import call_with_backoff, is_retryable
+
+# Refer: https://developers.google.com/gmail/api/guides/batch
+
+# Gmail accepts up to 100 calls per batch but recommends no more than 50,
+# attachments make the batch body large so stay well below that
+BATCH_SIZE = 20
+
+
+def get_batches(items, batch_size=BATCH_SIZE):
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def send_message(service, message):
+    # Call the Gmail API
+    return (service.users().messages().send(userId="me", body=message)
+            .execute())
+
+
+def send_batch(service, messages, bucket=None):
+    # messages maps a request id (the attachment path) to a prepared message.
+    # Returns the same ids mapped to None on success or the error for that
+    # message. Raises if the batch request itself fails.
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = exception
+
+    batch = service.new_batch_http_request(callback=callback)
+
+    for request_id, message in messages.items():
+        # Every message in a batch still counts against the send quota
+        if bucket is not None:
+            bucket.acquire()
+
+        batch.add(
+            service.users().messages().send(userId="me", body=message),
+            request_id=request_id)
+
+    batch.execute()
+
+    for request_id in messages:
+        if request_id not in results:
+            results[request_id] = RuntimeError("No response in batch")
+
+    return results
+
+
+def send_messages(service, messages, bucket=None, record=None):
+    # Sends messages in one batch request. Returns the ids that could not be
+    # sent mapped to their error. record(request_id, error) is called as soon
+    # as the outcome of each message is known.
+    failed = {}
+    retry_all = False
+
+    try:
+        results = send_batch(service, messages, bucket)
+
+    except Exception as e:
+        print(f"Batch request failed, sending {len(messages)} mails one at "
+              f"a time: {e}")
+        results = {request_id: e for request_id in messages}
+        retry_all = True
+
+    retries = []
+
+    for request_id, error in results.items():
+
+        if error is None:
+            # Recorded before any retries, which can take a while
+            if record is not None:
+                record(request_id, None)
+
+        elif not retry_all and not is_retryable(error):
+            failed[request_id] = error
+
+            if record is not None:
+                record(request_id, error)
+
+        else:
+            retries.append(request_id)
+
+    # Messages the batch could not deliver are sent on their own, with the
+    # usual backoff for quota and server errors
+    for request_id in retries:
+
+        try:
+            call_with_backoff(
+                lambda: send_message(service, messages[request_id]), bucket)
+            error = None
+
+        except Exception as e:
+            failed[request_id] = e
+            error = e
+
+        if record is not None:
+            record(request_id, error)
+
+    return failed
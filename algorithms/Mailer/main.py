@@ -1,57 +1,265 @@
 from glob import glob
-import time
 import os
-import shutil
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
 from algorithms.Mailer.mime_creator import *
 from algorithms.Mailer.login import login_mail_account
+from algorithms.Mailer.rate_limiter import (
+    Token_Bucket, call_with_backoff, SENDS_PER_SECOND)
+from algorithms.Mailer.batch_sender import (
+    send_message, send_messages, get_batches, BATCH_SIZE)
+from algorithms.Mailer.smtp_sender import SMTP_Pool
+from algorithms.Mailer.send_journal import Send_Journal
+from algorithms.Mailer.zipper import zip_all_dirs, ZIP_COMPRESSION_LEVEL
+
+# Sends are bounded by the token bucket, the threads only overlap the
+# network round trips
+SENDER_THREADS = 4
+
+# Attachments above this are streamed and sent with a media upload
+LARGE_ATTACHMENT_SIZE = 2 * 1024 * 1024
+
+thread_data = threading.local()
 
 
 def get_email_from_path(path):
     return ".".join(path.split(os.sep)[-1].split(".")[0:-1])
 
-def zip_all_dirs(path):
-    for root, dirs, files in os.walk(path):
-        for _dir in dirs:
-            print(f"Zipping {_dir}")
-            shutil.make_archive(os.path.join(path, _dir), 'zip', os.path.join(root, _dir))
+def get_mail_files(path):
+    for root, d, files in os.walk(path):
+
+        for _file in files:
+
+            if "@" not in _file:
+                continue
+
+            yield os.path.join(root, _file)
+
+
+def get_service(creds):
+    # Gmail service objects are not thread safe, each sender thread builds
+    # its own
+    if not hasattr(thread_data, "service"):
+        thread_data.service = build('gmail', 'v1', credentials=creds)
+
+    return thread_data.service
+
+
+def send_mail(creds, bucket, subject, body, file):
+    # Returns file -> error for the files that could not be sent
+
+    email = get_email_from_path(file)
+
+    print(f"Sending {os.path.basename(file)} to {email}")
+
+    try:
+        service = get_service(creds)
+
+        if os.path.getsize(file) > LARGE_ATTACHMENT_SIZE:
+            send_large_mail(service, bucket, email, subject, body, file)
+
+        else:
+            message = create_message_with_attachment(
+                email, subject, body, file)
+
+            call_with_backoff(lambda: send_message(service, message), bucket)
+
+    except Exception as e:
+        return {file: e}
+
+    return {}
+
+
+def send_large_mail(service, bucket, email, subject, body, file):
+    # The message is streamed to a temporary file and uploaded as is through
+    # the media upload endpoint, so it is never base64 encoded a second time
+    # for the raw field or held in memory
+
+    with tempfile.TemporaryFile() as fp:
+
+        write_message_with_attachment(fp, email, subject, body, file)
+
+        def send():
+            media = MediaIoBaseUpload(
+                fp, mimetype='message/rfc822', resumable=True)
+
+            return (service.users().messages()
+                    .send(userId="me", body={}, media_body=media).execute())
+
+        call_with_backoff(send, bucket)
+
+
+def send_mail_batch(creds, bucket, subject, body, files, journal, keys):
+    # Journals each message itself as soon as its outcome is known, so mails
+    # a batch delivered are recorded before any slow single send retries
+
+    def record(file, error):
+        journal.record(keys[file], file, error)
+
+    try:
+        service = get_service(creds)
+
+    except Exception as e:
+        # e.g. an expired token, none of the batch can be sent
+        for file in files:
+            record(file, e)
+
+        return {file: e for file in files}
+
+    messages = {}
+    failed = {}
+
+    for file in files:
+
+        email = get_email_from_path(file)
+
+        print(f"Sending {os.path.basename(file)} to {email}")
 
+        try:
+            messages[file] = create_message_with_attachment(
+                email, subject, body, file)
 
-def send_mails(subject, body, path):
+        except Exception as e:
+            failed[file] = e
+            record(file, e)
 
+    failed.update(send_messages(service, messages, bucket, record))
+
+    return failed
+
+
+def send_smtp_mail(pool, bucket, subject, body, file):
+
+    email = get_email_from_path(file)
+
+    print(f"Sending {os.path.basename(file)} to {email}")
+
+    try:
+        message = create_mime_message(email, subject, body, file)
+
+        call_with_backoff(lambda: pool.send(message), bucket)
+
+    except Exception as e:
+        return {file: e}
+
+    return {}
+
+
+def get_unsent_files(files, journal):
+    # Returns the files still to send and their journal keys
+
+    keys = {}
+    unsent = []
+
+    for file in files:
+
+        key = journal.get_key(get_email_from_path(file), file)
+        keys[file] = key
+
+        if journal.is_sent(key):
+            print(f"Skipping {os.path.basename(file)}, already sent")
+            continue
+
+        if journal.get_attempts(key) > 0:
+            print(f"Retrying {os.path.basename(file)}, failed "
+                  f"{journal.get_attempts(key)} time(s) before")
+
+        unsent.append(file)
+
+    return unsent, keys
+
+
+def collect_results(futures, journal, keys):
+    # futures maps each future to the files to journal once it is done
+
+    failed = {}
+
+    for future in as_completed(futures):
+
+        errors = future.result()
+        failed.update(errors)
+
+        for file in futures[future]:
+            journal.record(keys[file], file, errors.get(file))
+
+    return failed
+
+
+def send_mails(subject, body, path, workers=SENDER_THREADS,
+               rate=SENDS_PER_SECOND, batch_size=BATCH_SIZE, backend="gmail",
+               compression_level=ZIP_COMPRESSION_LEVEL):
 
     print("Starting...")
 
-    zip_all_dirs(path)
+    zip_all_dirs(path, compression_level)
+
+    journal = Send_Journal(path)
+    files, keys = get_unsent_files(list(get_mail_files(path)), journal)
+
+    bucket = Token_Bucket(rate)
+
+    if backend == "smtp":
+        pool = SMTP_Pool(workers)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            futures = {
+                executor.submit(send_smtp_mail, pool, bucket, subject, body,
+                                file): [file]
+                for file in files
+            }
+
+            failed = collect_results(futures, journal, keys)
+
+        pool.close()
+
+        report_failures(failed, files)
+
+        return
 
     creds = login_mail_account()
 
-    service = build('gmail', 'v1', credentials=creds)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
 
-    for root, d, files in os.walk(path):
+        # Large attachments go through media upload one at a time
+        large_files = [file for file in files
+                       if os.path.getsize(file) > LARGE_ATTACHMENT_SIZE]
+        small_files = [file for file in files if file not in large_files]
 
-        for _file in files:
+        futures = {
+            executor.submit(
+                send_mail, creds, bucket, subject, body, file): [file]
+            for file in (large_files if batch_size > 1 else files)
+        }
 
-            if "@" not in _file:
-                continue
+        if batch_size > 1:
+            # Batches journal their own results
+            futures.update({
+                executor.submit(
+                    send_mail_batch, creds, bucket, subject, body, batch,
+                    journal, keys): []
+                for batch in get_batches(small_files, batch_size)
+            })
 
-            email = get_email_from_path(_file)
+        failed = collect_results(futures, journal, keys)
 
-            print(f"Sending {_file} to {email}")
+    report_failures(failed, files)
 
-            try:
 
-                message = create_message_with_attachment(
-                    email, subject, body, os.path.join(root, _file))
+def report_failures(failed, files):
 
-                # Call the Gmail API
-                (service.users().messages().send(userId="me", body=message)
-                 .execute())
+    for file, error in failed.items():
+        print(f"ERROR: Failed to send {os.path.basename(file)} to "
+              f"{get_email_from_path(file)}: {error}")
 
-            except:
-                print(f"ERROR: Failed to send {_file} to {email}")
+    print(f"{len(files) - len(failed)} of {len(files)} mails sent")
 
-            time.sleep(2)
+    if failed:
+        print(f"{len(failed)} mails could not be sent, run again to retry "
+              f"them")
 
     print("**** Done ****")
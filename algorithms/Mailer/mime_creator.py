@@ -1,6 +1,7 @@
 import base64
 import os
 import mimetypes
+import uuid
 from email.mime.audio import *
 from email.mime.base import *
 from email.mime.image import *
@@ -8,21 +9,30 @@ from email.mime.multipart import *
 from email.mime.text import *
 from email import encoders
 
-def create_message_with_attachment(to, subject, message_text, file):
+# Multiple of 57 bytes so every chunk encodes to whole 76 character lines
+CHUNK_SIZE = 57 * 1024
 
-    message = MIMEMultipart()
-    message['to'] = to
-    message['subject'] = subject
 
-    msg = MIMEText(message_text)
-    message.attach(msg)
+def get_content_type(file):
 
     content_type, encoding = mimetypes.guess_type(file)
 
     if content_type is None or encoding is not None:
         content_type = 'application/octet-stream'
 
-    main_type, sub_type = content_type.split('/', 1)
+    return content_type.split('/', 1)
+
+
+def create_mime_message(to, subject, message_text, file):
+
+    message = MIMEMultipart()
+    message['to'] = to
+    message['subject'] = subject
+
+    msg = MIMEText(message_text)
+    message.attach(msg)
+
+    main_type, sub_type = get_content_type(file)
 
     if main_type == 'text':
         fp = open(file, 'rb')
@@ -55,4 +65,52 @@ def create_message_with_attachment(to, subject, message_text, file):
     msg.add_header('Content-Disposition', 'attachment', filename=filename)
     message.attach(msg)
 
+    return message
+
+
+def create_message_with_attachment(to, subject, message_text, file):
+
+    message = create_mime_message(to, subject, message_text, file)
+
     return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+
+def get_header_bytes(message):
+    return b"".join(message.policy.fold_binary(name, value)
+                    for name, value in message.items()) + b"\n"
+
+
+def write_message_with_attachment(out, to, subject, message_text, file):
+    # Same message as create_mime_message, written to a file object with
+    # the attachment base64 encoded a chunk at a time instead of held in
+    # memory several times over
+
+    boundary = "===============" + uuid.uuid4().hex + "=="
+
+    message = MIMEMultipart(boundary=boundary)
+    message['to'] = to
+    message['subject'] = subject
+
+    out.write(get_header_bytes(message))
+
+    out.write(f"--{boundary}\n".encode())
+    out.write(MIMEText(message_text).as_bytes())
+    out.write(f"\n--{boundary}\n".encode())
+
+    main_type, sub_type = get_content_type(file)
+
+    msg = MIMEBase(main_type, sub_type)
+    msg['Content-Transfer-Encoding'] = 'base64'
+    filename = os.path.basename(file)
+    msg.add_header('Content-Disposition', 'attachment', filename=filename)
+
+    out.write(get_header_bytes(msg))
+
+    fp = open(file, 'rb')
+
+    for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+        out.write(base64.encodebytes(chunk))
+
+    fp.close()
+
+    out.write(f"--{boundary}--\n".encode())
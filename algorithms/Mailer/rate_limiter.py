@@ -0,0 +1,93 @@
+import random
+import threading
+import time
+
+# Gmail API quota is 250 units per user per second and messages.send costs
+# 100 units, so 2 sends per second stays under it with some headroom
+SENDS_PER_SECOND = 2
+BURST_SIZE = 4
+
+MAX_RETRIES = 5
+BASE_DELAY = 1
+
+# 429 is rate limiting, 5xx are transient server side errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Token_Bucket:
+    # Shared by all sender threads, every send takes one token and tokens
+    # refill at a fixed rate up to the burst size
+
+    def __init__(self, rate=SENDS_PER_SECOND, capacity=BURST_SIZE):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self.refill()
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+
+
+def get_status(error):
+    # HttpError from the Gmail client keeps the HTTP response in resp
+    response = getattr(error, "resp", None)
+    status = getattr(response, "status", None)
+
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+
+    # SMTP 4xx replies are temporary failures
+    smtp_code = getattr(error, "smtp_code", None)
+    if isinstance(smtp_code, int) and 400 <= smtp_code < 500:
+        return True
+
+    return get_status(error) in RETRYABLE_STATUSES
+
+
+def call_with_backoff(
+    function, bucket=None, retries=MAX_RETRIES, base_delay=BASE_DELAY
+):
+    # Retries transient failures after 1, 2, 4, ... seconds plus jitter so
+    # threads that failed together do not retry together
+    attempt = 0
+
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+
+        try:
+            return function()
+
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+
+            delay = base_delay * 2 ** attempt + random.uniform(0, base_delay)
+            print(f"Retrying in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+            attempt += 1
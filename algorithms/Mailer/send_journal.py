@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+
+# Kept next to the files being mailed; the name has no "@" so it is never
+# picked up as an attachment
+JOURNAL_NAME = "send_journal.jsonl"
+
+
+def get_file_hash(file):
+    digest = hashlib.sha256()
+
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class Send_Journal:
+    # Append only log of send attempts keyed by recipient and attachment
+    # hash. A changed attachment gets a new key and is sent again.
+
+    def __init__(self, path):
+        self.file_name = os.path.join(path, JOURNAL_NAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.file_name):
+            return
+
+        with open(self.file_name) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line of a run that was killed mid write
+                    continue
+
+                # Later lines win, so this holds the latest state per key
+                self.entries[(entry["email"], entry["hash"])] = entry
+
+    def get_key(self, email, file):
+        return (email, get_file_hash(file))
+
+    def is_sent(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and entry["status"] == "sent"
+
+    def get_attempts(self, key):
+        entry = self.entries.get(key)
+        return entry["attempts"] if entry is not None else 0
+
+    def record(self, key, file, error=None):
+        with self.lock:
+            entry = {
+                "email": key[0],
+                "hash": key[1],
+                "file": os.path.basename(file),
+                "status": "sent" if error is None else "failed",
+                "attempts": self.get_attempts(key) + 1,
+                "error": None if error is None else str(error),
+            }
+            self.entries[key] = entry
+
+            with open(self.file_name, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
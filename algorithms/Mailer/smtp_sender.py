@@ -0,0 +1,113 @@
+import os
+import queue
+import smtplib
+import ssl
+import threading
+
+# For accounts without Gmail API access. Settings come from the environment,
+# e.g. for a local debugging server (python -m aiosmtpd -n -l localhost:8025):
+#   MAILER_SMTP_HOST=localhost MAILER_SMTP_PORT=8025 MAILER_SMTP_TLS=0
+SMTP_HOST = os.environ.get("MAILER_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("MAILER_SMTP_PORT", "587"))
+SMTP_USE_TLS = os.environ.get("MAILER_SMTP_TLS", "1") != "0"
+SMTP_USER = os.environ.get("MAILER_SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("MAILER_SMTP_PASSWORD", "")
+SMTP_TIMEOUT = 60
+
+# Errors that mean the connection itself is unusable
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class SMTP_Pool:
+    # Logged in connections are kept open and handed to sender threads one
+    # at a time, so the TLS handshake and login happen once per connection
+    # instead of once per mail
+
+    def __init__(self, size, host=SMTP_HOST, port=SMTP_PORT,
+                 use_tls=SMTP_USE_TLS, user=SMTP_USER, password=SMTP_PASSWORD):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.user = user
+        self.password = password
+        self.idle = queue.Queue(maxsize=size)
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+
+        if self.use_tls:
+            smtp.starttls(context=ssl.create_default_context())
+
+        if self.user:
+            smtp.login(self.user, self.password)
+
+        with self.lock:
+            self.connections.append(smtp)
+
+        return smtp
+
+    def get(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, smtp):
+        try:
+            self.idle.put_nowait(smtp)
+        except queue.Full:
+            self.discard(smtp)
+
+    def discard(self, smtp):
+        with self.lock:
+            if smtp in self.connections:
+                self.connections.remove(smtp)
+
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def send(self, message):
+        if self.user and 'from' not in message:
+            message['from'] = self.user
+
+        smtp = self.get()
+
+        try:
+            smtp.send_message(message)
+
+        except CONNECTION_ERRORS:
+            # Idle connections get dropped by the server, reconnect once
+            self.discard(smtp)
+            smtp = self.connect()
+
+            try:
+                smtp.send_message(message)
+            except CONNECTION_ERRORS:
+                self.discard(smtp)
+                raise
+            except Exception:
+                self.release(smtp)
+                raise
+
+        except Exception:
+            # Refused recipients and the like leave the connection usable
+            self.release(smtp)
+            raise
+
+        self.release(smtp)
+
+    def close(self):
+        with self.lock:
+            connections = list(self.connections)
+
+        for smtp in connections:
+            self.discard(smtp)
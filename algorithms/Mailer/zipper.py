@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Contents hash of every directory zipped so far, so unchanged directories
+# keep their archive. The name has no "@" so it is never mailed.
+ZIP_MANIFEST_NAME = "zip_manifest.json"
+
+ZIP_COMPRESSION_LEVEL = 6
+
+# Already compressed formats gain nothing from deflate, store them as is
+STORED_EXTENSIONS = {".xlsx", ".zip", ".png", ".jpg", ".jpeg"}
+
+
+def get_dir_files(directory):
+    # Relative paths in a fixed order so hashes and archives are repeatable
+    dir_files = []
+
+    for root, dirs, files in os.walk(directory):
+        for _file in files:
+            dir_files.append(
+                os.path.relpath(os.path.join(root, _file), directory))
+
+    return sorted(dir_files)
+
+
+def get_dir_hash(directory):
+    digest = hashlib.sha256()
+
+    for name in get_dir_files(directory):
+        digest.update(name.encode() + b"\0")
+
+        with open(os.path.join(directory, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def zip_dir(directory, archive, compression_level=ZIP_COMPRESSION_LEVEL):
+    # Temporary name without "@" so a leftover is never mailed
+    fd, temp_archive = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(archive))
+    os.close(fd)
+
+    with zipfile.ZipFile(temp_archive, 'w') as zf:
+        for name in get_dir_files(directory):
+
+            if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+                zf.write(os.path.join(directory, name), name,
+                         compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.write(os.path.join(directory, name), name,
+                         compress_type=zipfile.ZIP_DEFLATED,
+                         compresslevel=compression_level)
+
+    # A half written archive is never left under the real name
+    os.replace(temp_archive, archive)
+
+
+def load_zip_manifest(path):
+    try:
+        with open(os.path.join(path, ZIP_MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_zip_manifest(path, manifest):
+    with open(os.path.join(path, ZIP_MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def zip_all_dirs(path, compression_level=ZIP_COMPRESSION_LEVEL, workers=None):
+    # Each top level directory (one per IC) becomes <dir>.zip next to it
+
+    old_manifest = load_zip_manifest(path)
+    manifest = {}
+    changed = []
+
+    for _dir in sorted(os.listdir(path)):
+
+        directory = os.path.join(path, _dir)
+        if not os.path.isdir(directory):
+            continue
+
+        manifest[_dir] = get_dir_hash(directory)
+
+        if (old_manifest.get(_dir) == manifest[_dir]
+                and os.path.exists(directory + ".zip")):
+            continue
+
+        changed.append(_dir)
+
+    print(f"Zipping {len(changed)} of {len(manifest)} directories")
+
+    # zlib releases the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+
+        futures = {
+            executor.submit(zip_dir, os.path.join(path, _dir),
+                            os.path.join(path, _dir) + ".zip",
+                            compression_level): _dir
+            for _dir in changed
+        }
+
+        for future in as_completed(futures):
+
+            _dir = futures[future]
+
+            try:
+                future.result()
+                print(f"Zipped {_dir}")
+
+            except Exception as e:
+                print(f"ERROR: Could not zip {_dir}: {e}")
+                del manifest[_dir]
+
+    save_zip_manifest(path, manifest)
@@ -0,0 +1,121 @@
+import os
+
+ROOM_METADATA_CSV = "./room_metadata.csv"
+
+DEFAULT_ROOM_CAPTAINS = 1
+DEFAULT_INVIGILATORS = 2
+DEFAULT_CAPACITY_CLASS = "NORMAL"
+
+# Rooms that were hard coded before room_metadata.csv existed, used when the
+# file is missing: room, room_captains, invigilators, capacity_class
+BUILT_IN_ROOMS = [("F102", 2, 4, "BIG"), ("F105", 2, 4, "BIG")]
+
+# file name -> (mtime, room map) for tables already read in this process
+loaded_tables = {}
+
+
+class RoomInfo:
+    def __init__(self, room, floor, room_captains, invigilators, capacity_class):
+        self.room = room
+        self.floor = floor
+        self.room_captains = room_captains
+        self.invigilators = invigilators
+        self.capacity_class = capacity_class
+
+    def __repr__(self):
+        return (
+            f"{self.room} - {self.floor} - {self.room_captains} captains - "
+            f"{self.invigilators} invigilators - {self.capacity_class}"
+        )
+
+
+def get_floor(room_name):
+    if room_name[-3:].isdigit():
+        floor_number = int(room_name[-3])
+        return "Ground Floor" if floor_number == 1 else "First Floor"
+    return "Reserved"
+
+
+def get_default_room_info(room):
+    return RoomInfo(
+        room,
+        get_floor(room),
+        DEFAULT_ROOM_CAPTAINS,
+        DEFAULT_INVIGILATORS,
+        DEFAULT_CAPACITY_CLASS,
+    )
+
+
+def get_built_in_metadata():
+    room_metadata = {}
+
+    for room, room_captains, invigilators, capacity_class in BUILT_IN_ROOMS:
+        info = get_default_room_info(room)
+        info.room_captains = room_captains
+        info.invigilators = invigilators
+        info.capacity_class = capacity_class
+        room_metadata[room] = info
+
+    return room_metadata
+
+
+def load_room_metadata(file_name=ROOM_METADATA_CSV):
+    # room, floor, room_captains, invigilators, capacity_class
+    # Blank fields fall back to the defaults, floor to the room number
+    if not os.path.exists(file_name):
+        # Warn once, not on every room looked up
+        if file_name not in loaded_tables or loaded_tables[file_name][0] is not None:
+            print(f"****** ERROR: {file_name} not found ******")
+            print("Built in values will be used for F102 and F105" + os.linesep)
+            loaded_tables[file_name] = (None, get_built_in_metadata())
+
+        return loaded_tables[file_name][1]
+
+    mtime = os.path.getmtime(file_name)
+    if file_name in loaded_tables and loaded_tables[file_name][0] == mtime:
+        return loaded_tables[file_name][1]
+
+    room_metadata = {}
+
+    f = open(file_name)
+
+    for line in f.readlines():
+        splitted = list(map(str.strip, line.split(",")))
+        if len(splitted[0]) == 0:
+            continue
+
+        splitted += [""] * (5 - len(splitted))
+        room = splitted[0]
+        info = get_default_room_info(room)
+
+        try:
+            if splitted[1]:
+                info.floor = splitted[1]
+            if splitted[2]:
+                info.room_captains = int(splitted[2])
+            if splitted[3]:
+                info.invigilators = int(splitted[3])
+            if splitted[4]:
+                info.capacity_class = splitted[4]
+        except:
+            print(f"****** ERROR: Invalid room metadata for {room} ******")
+            print("Defaults will be used for this room" + os.linesep)
+            info = get_default_room_info(room)
+
+        room_metadata[room] = info
+
+    f.close()
+
+    loaded_tables[file_name] = (mtime, room_metadata)
+
+    return room_metadata
+
+
+def get_room_info(room, room_metadata=None):
+    if room_metadata is None:
+        room_metadata = load_room_metadata()
+
+    if room in room_metadata:
+        return room_metadata[room]
+
+    return get_default_room_info(room)
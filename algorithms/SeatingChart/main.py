@@ -1,14 +1,24 @@
 import json, sys
 import os
-import shutil
 import openpyxl
-import time
 import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+from collections import deque
 
 from openpyxl.drawing.image import Image
 from openpyxl.styles.borders import Border, Side
 from openpyxl.styles import Font, PatternFill
 
+from algorithms.SeatingChart.patterns import (
+    PARTNER_REMARKS,
+    get_seat_mask,
+    get_room_shares,
+)
+from algorithms.SeatingChart.pdf_charts import export_course_pdfs
+
+MANIFEST_PATH = os.path.join("Charts_and_Sheets", "manifest.json")
+
 
 class Course:
     def __init__(self, code, title):
@@ -172,116 +182,61 @@ def get_populated_maps(
 
 
 def generate_seating_charts(
-    room_map_csv, room_allotment_csv, registered_students_csv, ic_csv
+    room_map_csv,
+    room_allotment_csv,
+    registered_students_csv,
+    ic_csv,
+    output_format="xlsx",
 ):
     print("Generating Seating Charts")
     room_map, final_solution, course_list = get_populated_maps(
         room_map_csv, room_allotment_csv, registered_students_csv, ic_csv
     )
     left_out_students = {}
-    left_out_students_copy = {}
+    # (room, time, course code) -> students in the order they were seated
+    rosters = {}
     not_alloted_students = 0
+    # (room, time, remark) -> student count, so LEFT and RIGHT courses can
+    # see each other's size when splitting a room
+    room_counts = {}
+    for course in course_list.courses:
+        for room, remark, student_count, capacity in course.rooms:
+            room_counts[(room, course.time, remark.strip())] = student_count
+
     for course in course_list.courses:
         for room, remark, student_count, capacity in course.rooms:
             keys = get_matched_rooms(room_map, room)
+            shares = get_room_shares(room_map, keys, student_count)
+            partner_count = room_counts.get(
+                (room, course.time, PARTNER_REMARKS.get(remark.strip())), 0
+            )
+            partner_shares = get_room_shares(room_map, keys, partner_count)
             seated = 0
-            count = 0
-            for key in keys:
-
+            for key, share, partner_share in zip(keys, shares, partner_shares):
                 chart = final_solution[course.time][key]
+                mask = get_seat_mask(tuple(room_map[key]), remark, share, partner_share)
+                free_seats = [(r, c) for r, c in mask if chart[r][c] == ""]
+                students = course.students[
+                    course.allotment_index : course.allotment_index + len(free_seats)
+                ]
 
-                limits = room_map[key]
-                half_cap = int(int(capacity / 2))
-                start_point = 1 if student_count <= half_cap else 0
-                step_value = 1 if remark == "FULL" else 2
-
-                # Edit
-
-                for i in range(0, len(limits)):
-                    if chart[len(chart) - start_point - 1][i] != "":
-                        start_point = start_point ^ 1
-                    count += start_point
-                    f = False  # flag to make sure first only the chessboard filling is done
-                    if (
-                        remark != "FULL" and student_count > half_cap
-                    ):  # check if uneven fill
-                        if count == capacity - student_count:
-                            row = start_point
-                        elif count > capacity - student_count:
-                            row = 0
-                        elif count < capacity - student_count:
-                            for j in range(
-                                start_point, limits[i], step_value
-                            ):  # fill in chessboard pattern for maximum possible students
-                                if count >= capacity - student_count:
-                                    row = j
-                                    # to continous fill from this point
-                                    break
-                                if j + step_value >= limits[i]:
-                                    f = True
-                                if chart[len(chart) - j - 1][i] == "":
-                                    student = course.get_next_student()
-                                    chart[len(chart) - j - 1][
-                                        i
-                                    ] = f"{course.code} - {student}"
-                                    seated += 1
-                                    if limits[i] - j - 2 >= 0:
-                                        count += 1
-
-                        if f:
-                            start_point = start_point ^ 1
-                            continue
-
-                        while row < limits[i]:
-
-                            start_point = 0
-                            if seated >= student_count:
-                                break
-                            if chart[len(chart) - row - 1][i] == "":
-                                student = course.get_next_student()
-                                chart[limits[i] - row - 1][
-                                    i
-                                ] = f"{course.code} - {student}"
-                                seated += 1
-                            else:
-                                while chart[len(chart) - row - 1][i] != "":
-                                    if row < limits[i]:
-                                        row += 1
-                                    else:
-                                        break
-                                if row < limits[i]:
-                                    student = course.get_next_student()
-                                    chart[len(chart) - row - 1][
-                                        i
-                                    ] = f"{course.code} - {student}"
-                                    seated += 1
+                roster = rosters.setdefault((key, course.time, course.code), [])
 
-                    else:
-                        for j in range(start_point, limits[i], step_value):
-                            if seated >= student_count:
-                                break
-                            if chart[len(chart) - j - 1][i] == "":
-                                student = course.get_next_student()
-                                chart[len(chart) - j - 1][
-                                    i
-                                ] = f"{course.code} - {student}"
-                                seated += 1
-
-                        if remark != "FULL":
-                            start_point = start_point ^ 1
-            # Edit
+                for (r, c), student in zip(free_seats, students):
+                    chart[r][c] = f"{course.code} - {student}"
+                    roster.append(student)
+
+                course.allotment_index += len(students)
+                seated += len(students)
 
             for i in range(seated, student_count):
-                key_dict = (room, course.time)
-                if key_dict not in left_out_students:
-                    left_out_students[key_dict] = {}
-                    left_out_students_copy[key_dict] = {}
-                if course.code not in left_out_students[key_dict]:
-                    left_out_students[key_dict][course.code] = []
-                    left_out_students_copy[key_dict][course.code] = []
                 student = course.get_next_student()
-                left_out_students[key_dict][course.code].append(student)
-                left_out_students_copy[key_dict][course.code].append(student)
+                if student is None:
+                    break
+
+                left_out_students.setdefault((room, course.time), {}).setdefault(
+                    course.code, []
+                ).append(student)
                 not_alloted_students += 1
 
         if course.allotment_index < len(course.students):
@@ -289,31 +244,10 @@ def generate_seating_charts(
                 f"Seating Arrangement Discrepancy - {len(course.students) - course.allotment_index} students after {course.get_next_student()} for {course.code} - {course.title}"
             )
 
-    left_out_students_count = 0
-    for time_room, courses in left_out_students.items():
-        room = time_room[0]
-        for course_code in courses:
-            count = 0
-            course = course_list.find_by_code(course_code)
-            keys = get_matched_rooms(room_map, room)
-            for key in keys:
-                chart = final_solution[course.time][key]
-                limits = room_map[key]
-                for i in range(0, len(limits)):
-                    for j in range(start_point, limits[i], step_value):
-                        if count == len(left_out_students[time_room][course_code]):
-                            break
-
-                        student = left_out_students[time_room][course_code][count]
-
-                        if chart[limits[i] - j - 1][i] == "":
-                            chart[limits[i] - j - 1][i] = f"{course.code} - {student}"
-                            left_out_students_copy[time_room][course_code].remove(
-                                student
-                            )
-                            count += 1
-                            left_out_students_count += 1
-    export_charts(room_map, course_list, final_solution)
+    left_out_students_count, left_out_students = seat_left_out_students(
+        room_map, final_solution, left_out_students, rosters
+    )
+    export_charts(room_map, course_list, final_solution, rosters, output_format)
     print(
         "Number of students alloted after alloting consecutive seats where required",
         left_out_students_count,
@@ -327,7 +261,7 @@ def generate_seating_charts(
 
     with open("error_file.csv", "w", newline="") as csv_file:
         writer = csv.writer(csv_file)
-        for time_room, course_dict in left_out_students_copy.items():
+        for time_room, course_dict in left_out_students.items():
             count = 0
             for course, students in course_dict.items():
                 for student in students:
@@ -340,7 +274,172 @@ def generate_seating_charts(
     print("***** Done *****")
 
 
-def export_charts(room_map, course_list, final_solution):
+def get_free_seats(chart, limits):
+    # Empty cells column by column, from the back of the room to the front
+    return deque(
+        (len(chart) - j - 1, i)
+        for i in range(0, len(limits))
+        for j in range(0, limits[i])
+        if chart[len(chart) - j - 1][i] == ""
+    )
+
+
+def seat_left_out_students(room_map, final_solution, left_out_students, rosters):
+    # Second pass: give students who did not fit their pattern the next
+    # free consecutive seats in their room. Each grid is indexed once and
+    # every seat handed out is popped, so the pass is linear in seats.
+    free_seats = {}
+    seated_count = 0
+    still_left_out = {}
+
+    for (room, time), courses in left_out_students.items():
+        for course_code, students in courses.items():
+            queue = deque(students)
+
+            for key in get_matched_rooms(room_map, room):
+                if not queue:
+                    break
+
+                chart = final_solution[time][key]
+                if (time, key) not in free_seats:
+                    free_seats[(time, key)] = get_free_seats(chart, room_map[key])
+                seats = free_seats[(time, key)]
+                roster = rosters.setdefault((key, time, course_code), [])
+
+                while queue and seats:
+                    r, c = seats.popleft()
+                    student = queue.popleft()
+                    chart[r][c] = f"{course_code} - {student}"
+                    roster.append(student)
+                    seated_count += 1
+
+            if queue:
+                still_left_out.setdefault((room, time), {})[course_code] = list(queue)
+
+    return seated_count, still_left_out
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except Exception as e:
+        print(e)
+        print("Could not read chart manifest, regenerating all charts")
+        return {}
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def get_course_digest(course, room_map, final_solution, rosters, heading, logo):
+    # Everything that ends up in a course's seating and attendance workbooks.
+    # Room grids are included whole since other courses show up in them.
+    grids = {}
+    for room, flag, student_count, capacity in course.rooms:
+        for key in get_matched_rooms(room_map, room):
+            grids[key] = [
+                final_solution[course.time][key],
+                rosters.get((key, course.time, course.code), []),
+            ]
+
+    data = json.dumps(
+        [
+            course.code,
+            course.title,
+            course.ic_email,
+            course.time,
+            course.rooms,
+            grids,
+            heading,
+            logo,
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def keep_previous_entry(manifest, old_manifest, code):
+    # A course whose files could not be written keeps last run's entry, so
+    # its files are not removed as stale and the hash mismatch rebuilds it
+    # next run
+    if code in old_manifest:
+        manifest[code] = old_manifest[code]
+    else:
+        del manifest[code]
+
+
+def remove_stale_outputs(old_manifest, manifest):
+    current_files = set()
+    for entry in manifest.values():
+        current_files.update(entry["files"])
+
+    for entry in old_manifest.values():
+        for path in entry["files"]:
+            if path not in current_files and os.path.exists(path):
+                print(f"Removing stale {path}")
+
+                try:
+                    os.remove(path)
+
+                    if not os.listdir(os.path.dirname(path)):
+                        os.rmdir(os.path.dirname(path))
+                except OSError as e:
+                    # e.g. a workbook still open in Excel on Windows
+                    print(f"****** ERROR: Could not remove {path}: {e} ******")
+
+
+def get_pdf_job(course, room_map, final_solution, rosters, heading, path, path1):
+    rooms = []
+    for room, flag, student_count, capacity in course.rooms:
+        for key in get_matched_rooms(room_map, room):
+            rooms.append(
+                (
+                    key,
+                    final_solution[course.time][key],
+                    rosters.get((key, course.time, course.code), []),
+                )
+            )
+
+    return {
+        "code": course.code,
+        "title": course.title,
+        "rooms": rooms,
+        "exam_heading": heading,
+        "logo_path": "./logo.png",
+        "seating_path": path,
+        "attendance_path": path1,
+    }
+
+
+def export_pdfs(jobs, workers=None):
+    # Render each course in its own process; returns the courses that failed
+    failed = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(export_course_pdfs, job): job for job in jobs}
+
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+                print(f"Generated {job['code']}")
+            except Exception as e:
+                print(e)
+                print("Could not create ", job["seating_path"], " ", job["code"])
+                failed.append(job["code"])
+
+    return failed
+
+
+def export_charts(
+    room_map, course_list, final_solution, rosters, output_format="xlsx", workers=None
+):
     print("***** Starting Chart Generation *****")
 
     thin_border = Border(
@@ -353,28 +452,66 @@ def export_charts(room_map, course_list, final_solution):
     heading_font = Font(size=13, bold=True)
     sub_heading_font = Font(size=11, bold=True)
 
-    if os.path.exists("./Charts_and_Sheets") and os.path.isdir("./Charts_and_Sheets"):
-        shutil.rmtree("./Charts_and_Sheets")
-        time.sleep(0.5)
+    if not os.path.isdir("./Charts_and_Sheets"):
+        os.mkdir("./Charts_and_Sheets")
 
-    os.mkdir("./Charts_and_Sheets")
+    with open("./examHeading.txt") as f:
+        exam_heading = f.read()
 
-    if os.path.exists("./Charts_and_Sheets") and os.path.isdir("./Charts_and_Sheets"):
-        shutil.rmtree("./Charts_and_Sheets")
-        time.sleep(0.5)
+    with open("./logo.png", "rb") as f:
+        logo_digest = hashlib.sha256(f.read()).hexdigest()
 
-    os.mkdir("./Charts_and_Sheets")
+    old_manifest = load_manifest()
+    manifest = {}
+    pdf_jobs = []
+    extension = ".pdf" if output_format == "pdf" else ".xlsx"
 
     for course in course_list.courses:
         if course.time is None:
             continue
 
-        if not os.path.exists(f"./Charts_and_Sheets/{course.ic_email}"):
-            os.mkdir(f"./Charts_and_Sheets/{course.ic_email}")
+        path = os.path.join(
+            "Charts_and_Sheets",
+            course.ic_email,
+            course.code.split("/")[0] + " Seating Charts" + extension,
+        )
+
+        path1 = os.path.join(
+            "Charts_and_Sheets",
+            course.ic_email,
+            course.code.split("/")[0] + " Attendance Sheets" + extension,
+        )
+
+        digest = get_course_digest(
+            course,
+            room_map,
+            final_solution,
+            rosters,
+            exam_heading,
+            logo_digest + output_format,
+        )
+        manifest[course.code] = {"hash": digest, "files": [path, path1]}
+
+        previous = old_manifest.get(course.code)
+        if (
+            previous is not None
+            and previous["hash"] == digest
+            and all(os.path.exists(x) for x in previous["files"])
+        ):
+            print(f"Unchanged {course.code} - skipping")
+            continue
 
         if not os.path.exists(f"./Charts_and_Sheets/{course.ic_email}"):
             os.mkdir(f"./Charts_and_Sheets/{course.ic_email}")
 
+        if output_format == "pdf":
+            pdf_jobs.append(
+                get_pdf_job(
+                    course, room_map, final_solution, rosters, exam_heading, path, path1
+                )
+            )
+            continue
+
         wb_seating = openpyxl.Workbook()
 
         wb_attendance = openpyxl.Workbook()
@@ -383,7 +520,6 @@ def export_charts(room_map, course_list, final_solution):
             keys = get_matched_rooms(room_map, room)
 
             for key in keys:
-                list_students = []
                 print(f"Generating {course.code} - {key}")
 
                 wb_seating.create_sheet(key)
@@ -426,10 +562,8 @@ def export_charts(room_map, course_list, final_solution):
                 img.height = 100
                 img.left = 20
                 ws_attendance.add_image(img, "B1")
-                with open("./examHeading.txt") as f:
-                    data = f.read()
                 ws_attendance["A2"].font = heading_font
-                ws_attendance["A2"] = data
+                ws_attendance["A2"] = exam_heading
                 ws_attendance["A3"] = heading
                 ws_attendance["A3"].font = heading_font
                 ws_attendance["A4"] = "S.NO"
@@ -457,19 +591,11 @@ def export_charts(room_map, course_list, final_solution):
                             for x in row
                         ]
                     )
-                    for x in row:
-                        if x.split("-")[0].strip() == course.code:
-                            try:
-                                list_students.append(
-                                    x.split("-")[1] + "-" + x.split("-")[2]
-                                )
-                            except:
-                                print(course.code, x)
-                list_students.sort()
-                for i, stud in enumerate(list_students):
-                    ws_attendance.append(
-                        [i + 1, stud.split("-")[0], stud.split("-")[1], ""]
-                    )
+
+                roster = rosters.get((key, course.time, course.code), [])
+                for i, student in enumerate(roster):
+                    id_number, name = student.split(" - ", 1)
+                    ws_attendance.append([i + 1, id_number, name, ""])
 
                 for col in range(65, 90):
                     ws_seating.column_dimensions[chr(col)].width = 15
@@ -517,23 +643,19 @@ def export_charts(room_map, course_list, final_solution):
         del wb_attendance["Sheet"]
 
         try:
-            path = os.path.join(
-                "Charts_and_Sheets",
-                course.ic_email,
-                course.code.split("/")[0] + " Seating Charts" + ".xlsx",
-            )
-
-            path1 = os.path.join(
-                "Charts_and_Sheets",
-                course.ic_email,
-                course.code.split("/")[0] + " Attendance Sheets" + ".xlsx",
-            )
-
             wb_seating.save(path)
             wb_attendance.save(path1)
         except Exception as e:
             print(e)
             print("Could not create ", course.ic_email, " ", course.code)
+            keep_previous_entry(manifest, old_manifest, course.code)
+
+    if pdf_jobs:
+        for code in export_pdfs(pdf_jobs, workers):
+            keep_previous_entry(manifest, old_manifest, code)
+
+    remove_stale_outputs(old_manifest, manifest)
+    save_manifest(manifest)
 
 
 if __name__ == "__main__":
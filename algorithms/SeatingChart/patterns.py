@@ -0,0 +1,132 @@
+from functools import lru_cache
+
+# Seat coordinates are (row, col) in chart space. Column i of a room holds
+# limits[i] seats, counted from the back of the chart (last row) to the front.
+
+
+def consecutive(limits, offset):
+    # Every seat, column by column
+    return [
+        (j, i)
+        for i in range(0, len(limits))
+        for j in range(0, limits[i])
+        if j >= offset
+    ]
+
+
+def chessboard(limits, offset):
+    return [
+        (j, i)
+        for i in range(0, len(limits))
+        for j in range(0, limits[i])
+        if (i + j) % 2 == offset % 2
+    ]
+
+
+def every_third(limits, offset):
+    return [
+        (j, i)
+        for i in range(0, len(limits))
+        for j in range(0, limits[i])
+        if (i + j) % 3 == offset % 3
+    ]
+
+
+def diagonal(limits, offset):
+    return [
+        (j, i)
+        for i in range(0, len(limits))
+        for j in range(0, limits[i])
+        if (j - i) % 3 == offset % 3
+    ]
+
+
+PATTERNS = {
+    "CONSECUTIVE": consecutive,
+    "CHESSBOARD": chessboard,
+    "EVERY_THIRD": every_third,
+    "DIAGONAL": diagonal,
+}
+
+# remark -> (pattern, offset)
+# LEFT and RIGHT courses take complementary cells of the same pattern so
+# that two courses sharing a room never sit next to each other. A FULL room
+# holds a single course and fills consecutive seats.
+REMARK_PATTERNS = {
+    "LEFT": ("CHESSBOARD", 0),
+    "RIGHT": ("CHESSBOARD", 1),
+    "FULL": ("CONSECUTIVE", 0),
+}
+
+# Remarks that share a room and split the cells of one pattern
+PARTNER_REMARKS = {"LEFT": "RIGHT", "RIGHT": "LEFT"}
+
+
+def get_pattern(remark):
+    return REMARK_PATTERNS.get(remark.strip(), REMARK_PATTERNS["FULL"])
+
+
+def get_offset(limits, remark, fill_count, partner_count):
+    # In a room with an odd number of seats one half of the pattern is a
+    # cell larger, it goes to whichever course has more students
+    pattern, offset = get_pattern(remark)
+    partner = PARTNER_REMARKS.get(remark.strip())
+
+    if partner is None or fill_count == partner_count:
+        return offset
+
+    partner_offset = REMARK_PATTERNS[partner][1]
+    size = len(PATTERNS[pattern](limits, offset))
+    partner_size = len(PATTERNS[pattern](limits, partner_offset))
+
+    if (fill_count > partner_count) == (size < partner_size) and size != partner_size:
+        return partner_offset
+
+    return offset
+
+
+@lru_cache(maxsize=None)
+def get_seat_mask(limits, remark, fill_count, partner_count=0):
+    # Chart cells for `fill_count` students in a room laid out as `limits`,
+    # in seating order. Pattern seats are used first; any overflow is taken
+    # from the far end of the room so the complementary course, which fills
+    # from the front, does not collide with it.
+    pattern = get_pattern(remark)[0]
+    offset = get_offset(limits, remark, fill_count, partner_count)
+    preferred = PATTERNS[pattern](limits, offset)
+    preferred_set = set(preferred)
+
+    seats = preferred[:fill_count]
+
+    if fill_count > len(preferred):
+        others = [
+            (j, i)
+            for i in range(0, len(limits))
+            for j in range(0, limits[i])
+            if (j, i) not in preferred_set
+        ]
+        overflow = fill_count - len(preferred)
+        seats = seats + others[len(others) - min(overflow, len(others)) :]
+
+    height = max(limits)
+    mask = [(height - j - 1, i) for j, i in sorted(seats, key=lambda x: (x[1], x[0]))]
+
+    return tuple(mask)
+
+
+def get_room_shares(room_map, keys, student_count):
+    # Split a room allotment across all its matched chart keys by seat count
+    total_seats = sum(sum(room_map[key]) for key in keys)
+    shares = []
+    remaining = student_count
+
+    for index, key in enumerate(keys):
+        if index == len(keys) - 1 or total_seats == 0:
+            share = remaining
+        else:
+            share = -(-student_count * sum(room_map[key]) // total_seats)
+        share = min(share, remaining, sum(room_map[key]))
+        shares.append(share)
+        remaining -= share
+
+    return shares
@@ -0,0 +1,135 @@
+from xml.sax.saxutils import escape
+
+from reportlab.platypus import (
+    Paragraph,
+    Table,
+    TableStyle,
+    Spacer,
+    PageBreak,
+    Image,
+    SimpleDocTemplate,
+)
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import landscape, portrait, A4
+from reportlab.lib.colors import black, Color
+
+# Same shade as the XLSX seating charts
+highlight = Color(0xE8 / 255, 0xE8 / 255, 0xE8 / 255)
+
+
+def get_heading_style():
+    style_sheet = getSampleStyleSheet()
+    heading_style = style_sheet["Title"]
+    heading_style.fontSize = 13
+    return heading_style
+
+
+def get_sub_heading_style():
+    style_sheet = getSampleStyleSheet()
+    sub_heading_style = style_sheet["Title"]
+    sub_heading_style.fontSize = 11
+    return sub_heading_style
+
+
+def get_cell_text(cell):
+    # "CODE - ID - NAME" -> "CODE - ID", as in the XLSX charts
+    if cell == "":
+        return cell
+    return "-".join(cell.split("-")[0:2])
+
+
+def export_seating_pdf(job):
+    doc = SimpleDocTemplate(
+        job["seating_path"],
+        pagesize=landscape(A4),
+        leftMargin=20,
+        rightMargin=20,
+        topMargin=20,
+        bottomMargin=20,
+    )
+    heading_style = get_heading_style()
+    sub_heading_style = get_sub_heading_style()
+    flowables = []
+
+    for index, (key, grid, roster) in enumerate(job["rooms"]):
+        if index > 0:
+            flowables.append(PageBreak())
+
+        flowables.append(
+            Paragraph(escape(f"{key} - {job['code']} - {job['title']}"), heading_style)
+        )
+        flowables.append(Paragraph("***** Blackboard Here *****", sub_heading_style))
+
+        style = [
+            ("BOX", (0, 0), (-1, -1), 0.25, black),
+            ("INNERGRID", (0, 0), (-1, -1), 0.25, black),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("FONTSIZE", (0, 0), (-1, -1), 7),
+        ]
+        for r, row in enumerate(grid):
+            for c, cell in enumerate(row):
+                if cell.split("-")[0].strip() == job["code"]:
+                    style.append(("BACKGROUND", (c, r), (c, r), highlight))
+
+        col_width = doc.width / max(1, len(grid[0]))
+        flowables.append(
+            Table(
+                [[get_cell_text(cell) for cell in row] for row in grid],
+                colWidths=[col_width] * len(grid[0]),
+                style=TableStyle(style),
+            )
+        )
+
+    doc.build(flowables)
+
+
+def export_attendance_pdf(job):
+    doc = SimpleDocTemplate(job["attendance_path"], pagesize=portrait(A4))
+    heading_style = get_heading_style()
+    flowables = []
+
+    for index, (key, grid, roster) in enumerate(job["rooms"]):
+        if index > 0:
+            flowables.append(PageBreak())
+
+        flowables.append(Image(job["logo_path"], width=300, height=67))
+        flowables.append(
+            Paragraph(escape(job["exam_heading"]).replace("\n", "<br/>"), heading_style)
+        )
+        flowables.append(
+            Paragraph(escape(f"{key} - {job['code']} - {job['title']}"), heading_style)
+        )
+        flowables.append(Spacer(1, 10))
+
+        rows = [["S.NO", "ID NUMBER", "NAME", "SIGNATURE"]]
+        for i, student in enumerate(roster):
+            id_number, name = student.split(" - ", 1)
+            rows.append([i + 1, id_number, name, ""])
+
+        flowables.append(
+            Table(
+                rows,
+                colWidths=[40, 90, 220, 150],
+                rowHeights=20,
+                repeatRows=1,
+                style=TableStyle(
+                    [
+                        ("BOX", (0, 0), (-1, -1), 0.25, black),
+                        ("INNERGRID", (0, 0), (-1, -1), 0.25, black),
+                        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                        ("ALIGN", (0, 0), (1, -1), "CENTER"),
+                        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                    ]
+                ),
+            )
+        )
+
+    doc.build(flowables)
+
+
+def export_course_pdfs(job):
+    # Runs in a worker process, so a job holds only plain data
+    export_seating_pdf(job)
+    export_attendance_pdf(job)
+    return job["code"]
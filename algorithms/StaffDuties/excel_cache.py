@@ -0,0 +1,69 @@
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+CACHE_DIR = "./.excel_cache"
+
+# path -> (key, sheets) for workbooks already parsed in this process
+loaded_workbooks = {}
+
+
+def get_cache_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def get_cache_path(path):
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, name + ".pkl")
+
+
+def load_cached_sheets(path, key):
+    cache_path = get_cache_path(path)
+
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except Exception:
+        return None
+
+    if cached["key"] != key:
+        return None
+
+    return cached["sheets"]
+
+
+def save_cached_sheets(path, key, sheets):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(get_cache_path(path), "wb") as f:
+            pickle.dump({"key": key, "sheets": sheets}, f)
+    except Exception as e:
+        print(f"Could not cache {path}: {e}")
+
+
+def read_workbook(path):
+    # All sheets of a workbook, parsed once per (path, mtime, size). Parsed
+    # frames are pickled so reruns on unchanged files skip the XLSX parsing.
+    key = get_cache_key(path)
+
+    if path not in loaded_workbooks or loaded_workbooks[path][0] != key:
+        sheets = load_cached_sheets(path, key)
+
+        if sheets is None:
+            print(f"Reading {os.path.basename(path)}")
+            sheets = pd.read_excel(path, sheet_name=None, header=None)
+            save_cached_sheets(path, key, sheets)
+
+        loaded_workbooks[path] = (key, sheets)
+
+    return {name: frame.copy() for name, frame in loaded_workbooks[path][1].items()}
+
+
+def read_first_sheet(path):
+    return next(iter(read_workbook(path).values()))
@@ -1,6 +1,9 @@
 import pandas as pd
 import os
 
+from algorithms.StaffDuties.excel_cache import read_workbook, read_first_sheet
+from algorithms.RoomMetadata import load_room_metadata, get_room_info
+
 # Set Pandas to display all rows and columns
 pd.set_option("display.max_rows", None)  # Show all rows
 pd.set_option("display.max_columns", None)  # Show all columns
@@ -8,7 +11,7 @@ pd.set_option("display.max_columns", None)  # Show all columns
 
 def get_room_data(staff_duties):
     try:
-        room_data = pd.read_excel(staff_duties, sheet_name="ROOM", header=None)
+        room_data = read_workbook(staff_duties)["ROOM"]
         room_data.columns = ["Room", "Time"]
     except:
         print("Error: Sheet 'ROOM' not found in the excel file")
@@ -21,14 +24,14 @@ def get_room_data(staff_duties):
     room_data["Period"] = room_data["End Time"].apply(
         lambda x: "FN" if x < "14:00" else "AN" if x >= "14:00" else ""
     )
-    room_data["Floor"] = room_data["Room"].apply(get_floor)
+    room_data = room_data.merge(get_room_table(room_data["Room"].unique()), on="Room")
 
     return room_data
 
 
 def get_staff_data(staff_duties):
     try:
-        staff_data = pd.read_excel(staff_duties, sheet_name="STAFF", header=None)
+        staff_data = read_workbook(staff_duties)["STAFF"]
     except:
         print("Error: Sheet 'STAFF' not found in the excel file")
 
@@ -46,20 +49,58 @@ def get_staff_data(staff_duties):
 
 
 def get_leave_data(staff_leave):
-    leave_data = pd.read_excel(staff_leave, header=None)
+    leave_data = read_first_sheet(staff_leave)
     leave_data.columns = ["ID", "email", "start_date", "end_date"]
     return leave_data
 
 
-def get_floor(room_name):
-    if room_name[-3:].isdigit():
-        floor_number = int(room_name[-3])
-        return "Ground Floor" if floor_number == 1 else "First Floor"
-    return "Reserved"
+def get_leave_calendar(leave_data):
+    # ID -> every date the staff member is on leave, with each
+    # (start_date, end_date) row expanded day by day
+    start_dates = pd.to_datetime(
+        leave_data["start_date"], format="%d-%m-%y", errors="coerce"
+    )
+    end_dates = pd.to_datetime(
+        leave_data["end_date"], format="%d-%m-%y", errors="coerce"
+    )
+
+    leave_calendar = {}
+    for staff_id, start_date, end_date in zip(
+        leave_data["ID"], start_dates.fillna(end_dates), end_dates.fillna(start_dates)
+    ):
+        if pd.isna(start_date):
+            continue
+
+        leave_calendar.setdefault(staff_id, set()).update(
+            pd.date_range(start_date.normalize(), end_date.normalize())
+        )
+
+    return leave_calendar
+
+
+def get_available_captains(captains, leave_calendar, dates):
+    # date -> captains not on leave that day, in the captains' file order
+    return {
+        date: [
+            captain
+            for captain in captains
+            if date not in leave_calendar.get(captain[0], ())
+        ]
+        for date in dates
+    }
+
+
+def get_room_table(rooms):
+    room_metadata = load_room_metadata()
+    room_info = [get_room_info(room, room_metadata) for room in rooms]
+    return pd.DataFrame(
+        [(info.room, info.floor, info.room_captains) for info in room_info],
+        columns=["Room", "Floor", "Room Captains"],
+    )
 
 
 def get_duty_limits(max_duties):
-    duty_limits_data = pd.read_excel(max_duties, header=None)
+    duty_limits_data = read_first_sheet(max_duties)
     duty_limits_data.columns = ["ID", "Max Duties"]
     duty_limits = dict(zip(duty_limits_data["ID"], duty_limits_data["Max Duties"]))
 
@@ -68,17 +109,11 @@ def get_duty_limits(max_duties):
 
 def main_allot(room_data, staff_data, leave_data, duty_limits):
 
-    # Merging Data (staff data and leave data)
-    merged_data = pd.merge(
-        staff_data,
-        leave_data[["ID", "end_date"]],
-        on=["ID"],
-        how="left",
-    )
+    leave_calendar = get_leave_calendar(leave_data)
 
     # Assinging Group captains and Room Captains
-    room_captains = merged_data[merged_data["Role"] == "ROOM CAPTAIN"]
-    group_captains = merged_data[merged_data["Role"] == "GROUP CAPTAIN"]
+    room_captains = staff_data[staff_data["Role"] == "ROOM CAPTAIN"]
+    group_captains = staff_data[staff_data["Role"] == "GROUP CAPTAIN"]
 
     # Indexing Room and Group Captains according to their branch
 
@@ -89,86 +124,39 @@ def main_allot(room_data, staff_data, leave_data, duty_limits):
     room_data["Date"] = pd.to_datetime(
         room_data["Date"], format="%d-%m-%y", errors="coerce", dayfirst=True
     )
-    room_captains.loc[:, "end_date"] = pd.to_datetime(
-        room_captains["end_date"], format="%d-%m-%y", errors="coerce"
-    )
-    group_captains.loc[:, "end_date"] = pd.to_datetime(
-        group_captains["end_date"], format="%d-%m-%y", errors="coerce"
-    )
-
-    room_data["Room Captain Name"] = None
-    room_data["Room Captain ID"] = None
-    room_data["Group Captain Name"] = None
-    room_data["Group Captain ID"] = None
-
-    room_data = allot_room_captains(room_data, room_captains, duty_limits)
-    room_data = allot_group_captains(room_data, group_captains, duty_limits)
-
-    # Final Modifications to the data
-    room_data["Group Captain Email ID"] = (
-        room_data["Group Captain"].str.split("-").str[3]
-    )
-    room_data["Group Captain Mobile Number"] = (
-        room_data["Group Captain"].str.split("-").str[2]
-    )
-    room_data["Group Captain Name"] = room_data["Group Captain"].str.split("-").str[1]
-    room_data["Group Captain ID"] = room_data["Group Captain"].str.split("-").str[0]
 
-    rows_to_duplicate = room_data[room_data["Room"].isin(["F102", "F105"])]
-    duplicated_rows = rows_to_duplicate.copy()
-    room_data.loc[rows_to_duplicate.index, "Room Captain"] = (
-        rows_to_duplicate["Room Captain"].str.split(",").str[0]
+    room_data = allot_room_captains(
+        room_data, room_captains, duty_limits, leave_calendar
     )
-    duplicated_rows["Room Captain"] = (
-        rows_to_duplicate["Room Captain"].str.split(",").str[1]
+    room_data = allot_group_captains(
+        room_data, group_captains, duty_limits, leave_calendar
     )
 
-    room_data_1 = pd.concat([room_data, duplicated_rows], ignore_index=True)
-
-    room_data_1["Room Captain Email ID"] = (
-        room_data_1["Room Captain"].str.split("-").str[3]
-    )
-    room_data_1["Room Captain Mobile Number"] = (
-        room_data_1["Room Captain"].str.split("-").str[2]
-    )
-    room_data_1["Room Captain Name"] = room_data_1["Room Captain"].str.split("-").str[1]
-    room_data_1["Room Captain ID"] = room_data_1["Room Captain"].str.split("-").str[0]
+    # Convert date back to desired format for display
+    room_data["Date"] = room_data["Date"].dt.strftime("%d-%m-%Y")
 
-    room_captains = room_captains.rename(
-        columns={
-            "ID": "Room Captain ID",
-            "Branch": "Room Captain Branch",
-            "Name": "Room Captain Name",
-        }
+    # One row per room captain, with captain details joined on ID
+    room_data = room_data.explode("Room Captain IDs").rename(
+        columns={"Room Captain IDs": "Room Captain ID"}
     )
 
-    room_data_1["Room Captain ID"] = room_data_1["Room Captain ID"].astype(str)
-    room_captains.loc[:, "Room Captain ID"] = room_captains["Room Captain ID"].astype(
-        str
+    # Excel may give numeric IDs, join on the same stripped strings as the
+    # staff side
+    room_data["Room Captain ID"] = room_data["Room Captain ID"].astype(str).str.strip()
+    room_data["Group Captain ID"] = (
+        room_data["Group Captain ID"].astype(str).str.strip()
     )
-    room_data_1["Room Captain ID"] = room_data_1["Room Captain ID"].str.strip()
-    room_captains.loc[:, "Room Captain ID"] = room_captains[
-        "Room Captain ID"
-    ].str.strip()
-
-    merged_df = room_data_1.merge(room_captains, on="Room Captain ID", how="inner")
-
-    merged_df.drop(
-        ["Room Captain Name_y", "Role", "Mobile Number", "Email", "end_date"],
-        axis=1,
-        inplace=True,
+    merged_df = room_data.merge(
+        get_captain_details(staff_data, "ROOM CAPTAIN", "Room Captain"),
+        on="Room Captain ID",
+        how="inner",
     )
-
-    merged_df.rename(
-        columns={
-            "Room Captain Name_x": "Room Captain Name",
-            "Room Captain Branch_y": "Room Captain Branch",
-        },
-        inplace=True,
+    merged_df = merged_df.merge(
+        get_captain_details(staff_data, "GROUP CAPTAIN", "Group Captain"),
+        on="Group Captain ID",
+        how="left",
     )
 
-    merged_df.drop(["Room Captain", "Group Captain"], axis=1, inplace=True)
-
     cols = [
         "Room",
         "Date",
@@ -191,111 +179,110 @@ def main_allot(room_data, staff_data, leave_data, duty_limits):
     return merged_df
 
 
+def get_captain_details(staff_data, role, prefix):
+    captains = staff_data[staff_data["Role"] == role].drop_duplicates(subset=["ID"])
+    captains = captains[["ID", "Name", "Email", "Mobile Number", "Branch"]].astype(str)
+    captains["ID"] = captains["ID"].str.strip()
+    return captains.rename(
+        columns={
+            "ID": f"{prefix} ID",
+            "Name": f"{prefix} Name",
+            "Email": f"{prefix} Email ID",
+            "Mobile Number": f"{prefix} Mobile Number",
+            "Branch": f"{prefix} Branch",
+        }
+    )
+
+
 # Allotment of room captains
-def allot_room_captains(room_data, room_captains, duty_limits):
+def allot_room_captains(room_data, room_captains, duty_limits, leave_calendar):
     print("Allotting Room Captains....")
-    room_data["Room Captain"] = None
-    duties = {captain: [] for captain in room_captains["ID"]}
-    branch_duty_count = {}
-
-    for idx, row in room_data.iterrows():
-        available_captains = room_captains[
-            room_captains["end_date"].isna()
-            | (room_captains["end_date"] != row["Date"])
-        ]
-        assigned_captains = []
 
-        for _, captain_row in available_captains.iterrows():
-            captain_id = captain_row["ID"]
-            captain_name = captain_row["Name"]
-            branch = captain_row["Branch"]
-            mobile_number = captain_row["Mobile Number"]
-            email_id = captain_row["Email"]
-            max_duties = duty_limits.get(captain_id, 10)  # Default to 10 if not found
+    # Plain records instead of DataFrame rows, in the captains' file order
+    captains = [
+        (captain_id, duty_limits.get(captain_id, 10))  # Default to 10 if not found
+        for captain_id in room_captains["ID"]
+    ]
+    duties = {captain_id: set() for captain_id, _ in captains}
+    duty_count = {captain_id: 0 for captain_id, _ in captains}
+    allotted = {}
+
+    slots = list(zip(room_data["Date"], room_data["Period"], room_data["Room"]))
+    captain_counts = dict(zip(slots, room_data["Room Captains"]))
+    available = get_available_captains(
+        captains, leave_calendar, {date for date, _, _ in slots}
+    )
+
+    for date, period, room in slots:
+        if (date, period, room) in allotted:
+            continue
 
-            # Initialize branch count for the date if not present
-            if (row["Date"], branch) not in branch_duty_count:
-                branch_duty_count[(row["Date"], branch)] = 0
+        assigned_captains = []
 
-            # Check branch constraint and max duties
-            branch_total = len(room_captains[room_captains["Branch"] == branch])
+        for captain_id, max_duties in available[date]:
             if (
-                len(duties[captain_id]) < max_duties
-                and room_data.loc[idx, "Room Captain"] is None
-                and not any(
-                    (duty_date == row["Date"] and duty_period == row["Period"])
-                    for duty_date, duty_period in duties[captain_id]
-                )
+                duty_count[captain_id] < max_duties
+                and (date, period) not in duties[captain_id]
             ):
+                assigned_captains.append(captain_id)
+                duties[captain_id].add((date, period))
+                duty_count[captain_id] += 1
 
-                assigned_captains.append(
-                    f"{captain_id} - {captain_name} - {mobile_number} - {email_id}"
-                )
-                duties[captain_id].append((row["Date"], row["Period"]))
-                branch_duty_count[(row["Date"], branch)] += 1
-
-                if row["Room"] in ["F102", "F105"] and len(assigned_captains) < 2:
+                if len(assigned_captains) < captain_counts[(date, period, room)]:
                     continue
                 else:
                     break
 
         if len(assigned_captains) == 0:
             continue
-        room_data.loc[
-            (room_data["Date"] == row["Date"])
-            & (room_data["Period"] == row["Period"])
-            & (room_data["Room"] == row["Room"]),
-            "Room Captain",
-        ] = ", ".join(assigned_captains)
+        allotted[(date, period, room)] = assigned_captains
+
+    room_data["Room Captain IDs"] = [allotted.get(slot, []) for slot in slots]
 
-    # Convert date back to desired format for display
-    room_data["Date"] = room_data["Date"].dt.strftime("%d-%m-%Y")
     return room_data
 
 
 # Allotment of group captains
-def allot_group_captains(room_data, group_captains, duty_limits):
+def allot_group_captains(room_data, group_captains, duty_limits, leave_calendar):
     print("Allotting Group Captains....")
-    room_data["Group Captain"] = None
-    duties = {captain: [] for captain in group_captains["ID"]}
-    allotted_duties = {}
-    for floor in room_data["Floor"].unique():
-        floor_rooms = room_data[room_data["Floor"] == floor]
-
-        for idx, row in floor_rooms.iterrows():
-            for _, captain_row in group_captains.iterrows():
-                captain_id = captain_row["ID"]
-                captain_name = captain_row["Name"]
-                branch = captain_row["Branch"]
-                mobile_number = captain_row["Mobile Number"]
-                email_id = captain_row["Email"]
-                max_duties = duty_limits.get(
-                    captain_id, 10
-                )  # Default to 10 if not found
-
-                if (
-                    len(duties[captain_id]) < max_duties
-                    and not allotted_duties.get(
-                        f"{row['Date']}|{row['Period']}|{row['Floor']}", False
-                    )
-                    and not any(
-                        duty_date == row["Date"]
-                        and (duty_period != row["Period"] or duty_floor != floor)
-                        for duty_date, duty_period, duty_floor in duties[captain_id]
-                    )
-                ):
-
-                    room_data.loc[
-                        (room_data["Date"] == row["Date"])
-                        & (room_data["Period"] == row["Period"])
-                        & (room_data["Floor"] == row["Floor"]),
-                        "Group Captain",
-                    ] = f"{captain_id} - {captain_name} - {mobile_number} - {email_id}"
-                    allotted_duties[f"{row['Date']}|{row['Period']}|{row['Floor']}"] = (
-                        True
-                    )
-                    duties[captain_id].append((row["Date"], row["Period"], floor))
-                    break
+    captains = [
+        (captain_id, duty_limits.get(captain_id, 10))  # Default to 10 if not found
+        for captain_id in group_captains["ID"]
+    ]
+    duty_dates = {captain_id: set() for captain_id, _ in captains}
+    duty_count = {captain_id: 0 for captain_id, _ in captains}
+
+    # One group captain per (date, period, floor), solved in the order the
+    # slots first appear floor by floor
+    floor_order = {floor: i for i, floor in enumerate(room_data["Floor"].unique())}
+    groups = room_data[["Date", "Period", "Floor"]].drop_duplicates()
+    groups = groups.sort_values(
+        "Floor", kind="stable", key=lambda floors: floors.map(floor_order)
+    )
+
+    available = get_available_captains(captains, leave_calendar, set(groups["Date"]))
+
+    allotted = []
+    for date, period, floor in zip(groups["Date"], groups["Period"], groups["Floor"]):
+        group_captain = None
+
+        for captain_id, max_duties in available[date]:
+            # A captain covers at most one floor and period per day
+            if (
+                duty_count[captain_id] < max_duties
+                and date not in duty_dates[captain_id]
+            ):
+                group_captain = captain_id
+                duty_dates[captain_id].add(date)
+                duty_count[captain_id] += 1
+                break
+
+        # As strings, so unfilled slots do not turn numeric IDs into floats
+        allotted.append("" if group_captain is None else str(group_captain))
+
+    groups["Group Captain ID"] = allotted
+
+    room_data = room_data.merge(groups, on=["Date", "Period", "Floor"], how="left")
 
     return room_data
 
@@ -0,0 +1,171 @@
+import pytest
+
+from algorithms.Mailer import batch_sender, rate_limiter
+
+
+class Fake_Response:
+    def __init__(self, status):
+        self.status = status
+
+
+class Fake_Http_Error(Exception):
+    # Same shape as googleapiclient.errors.HttpError
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = Fake_Response(status)
+
+
+class Fake_Request:
+    def __init__(self, transport, message):
+        self.transport = transport
+        self.message = message
+
+    def execute(self):
+        return self.transport.execute(self.message)
+
+
+class Fake_Batch:
+    def __init__(self, transport, callback):
+        self.transport = transport
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.transport.batches.append([rid for rid, _ in self.requests])
+
+        if self.transport.fail_batch:
+            raise ConnectionError("batch request failed")
+
+        for request_id, request in self.requests:
+            try:
+                response = request.execute()
+            except Exception as e:
+                self.callback(request_id, None, e)
+            else:
+                self.callback(request_id, response, None)
+
+
+class Fake_Transport:
+    # Stands in for the Gmail service, errors maps a message to the statuses
+    # its next sends fail with
+    def __init__(self, errors=None, fail_batch=False):
+        self.errors = {key: list(value) for key, value in (errors or {}).items()}
+        self.fail_batch = fail_batch
+        self.batches = []
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        return Fake_Request(self, body)
+
+    def new_batch_http_request(self, callback):
+        return Fake_Batch(self, callback)
+
+    def execute(self, message):
+        statuses = self.errors.get(message["raw"])
+        if statuses:
+            raise Fake_Http_Error(statuses.pop(0))
+
+        self.sent.append(message["raw"])
+        return {"id": message["raw"]}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: None)
+
+
+def get_messages(*names):
+    return {name: {"raw": name} for name in names}
+
+
+def test_batch_success():
+    transport = Fake_Transport()
+
+    failed = batch_sender.send_messages(transport, get_messages("a", "b", "c"))
+
+    assert failed == {}
+    assert transport.batches == [["a", "b", "c"]]
+    assert transport.sent == ["a", "b", "c"]
+
+
+def test_batch_per_message_errors():
+    transport = Fake_Transport(errors={"b": [429], "c": [400]})
+
+    failed = batch_sender.send_messages(transport, get_messages("a", "b", "c"))
+
+    # 429 is retried on its own, 400 is reported
+    assert list(failed) == ["c"]
+    assert failed["c"].resp.status == 400
+    assert len(transport.batches) == 1
+    assert sorted(transport.sent) == ["a", "b"]
+
+
+def test_failed_batch_falls_back_to_single_sends():
+    transport = Fake_Transport(fail_batch=True, errors={"b": [503]})
+
+    failed = batch_sender.send_messages(transport, get_messages("a", "b"))
+
+    assert failed == {}
+    assert len(transport.batches) == 1
+    assert transport.sent == ["a", "b"]
+
+
+def test_send_batch_reports_every_message():
+    transport = Fake_Transport(errors={"b": [400]})
+
+    results = batch_sender.send_batch(transport, get_messages("a", "b"))
+
+    assert results["a"] is None
+    assert results["b"].resp.status == 400
+
+
+def test_get_batches():
+    assert list(batch_sender.get_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_successes_recorded_before_retries():
+    transport = Fake_Transport(errors={"a": [429]})
+    recorded = []
+
+    def record(request_id, error):
+        recorded.append((request_id, error is None, list(transport.sent)))
+
+    batch_sender.send_messages(transport, get_messages("a", "b"), record=record)
+
+    # b is journalled while a is still waiting for its single send
+    assert recorded == [("b", True, ["b"]), ("a", True, ["b", "a"])]
+
+
+def test_batch_service_error_fails_every_file(tmp_path, monkeypatch):
+    pytest.importorskip("googleapiclient")
+    from algorithms.Mailer import main
+    from algorithms.Mailer.send_journal import Send_Journal
+
+    def get_service(creds):
+        raise ConnectionError("token expired")
+
+    monkeypatch.setattr(main, "get_service", get_service)
+
+    files = []
+    for email in ("a@x.com", "b@x.com"):
+        files.append(str(tmp_path / f"{email}.pdf"))
+        (tmp_path / f"{email}.pdf").write_bytes(b"%PDF")
+
+    journal = Send_Journal(str(tmp_path))
+    unsent, keys = main.get_unsent_files(files, journal)
+
+    failed = main.send_mail_batch(None, None, "Subject", "Body", unsent,
+                                  journal, keys)
+
+    assert sorted(failed) == sorted(files)
+    assert all(journal.get_attempts(keys[file]) == 1 for file in files)
+    assert not any(journal.is_sent(keys[file]) for file in files)
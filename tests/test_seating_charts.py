@@ -0,0 +1,48 @@
+from algorithms.SeatingChart import main
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_odd_room_larger_right_course(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    write_lines(tmp_path / "room_map.csv", ["F105,3,5,5,5"])
+    write_lines(
+        tmp_path / "allot.csv",
+        [
+            "Room,Course Code,Course Name,Room Capacity,Student Count,"
+            "Course Strength,Time,Remarks",
+            "F105,MA004,Maths 4,15,7,7,D1,LEFT",
+            "F105,MA007,Maths 7,15,8,8,D1,RIGHT",
+        ],
+    )
+    write_lines(
+        tmp_path / "students.csv",
+        [f"Name{i},MA004ID{i},MA004" for i in range(7)]
+        + [f"Name{i},MA007ID{i},MA007" for i in range(8)],
+    )
+    write_lines(tmp_path / "ic.csv", ["MA004,a@x.com", "MA007,b@x.com"])
+
+    charts = {}
+
+    def export_charts(room_map, course_list, final_solution, *args, **kwargs):
+        charts.update(final_solution["D1"])
+
+    monkeypatch.setattr(main, "export_charts", export_charts)
+
+    main.generate_seating_charts("room_map.csv", "allot.csv", "students.csv", "ic.csv")
+
+    chart = charts["F105"]
+    courses = [[cell.split(" - ")[0] for cell in row] for row in chart]
+
+    assert sum(row.count("MA004") for row in courses) == 7
+    assert sum(row.count("MA007") for row in courses) == 8
+
+    for r, row in enumerate(courses):
+        for c, course in enumerate(row):
+            if r + 1 < len(courses):
+                assert course != courses[r + 1][c]
+            if c + 1 < len(row):
+                assert course != row[c + 1]